@@ -0,0 +1,98 @@
+"""
+AURA Admission Control
+Caps how many turns run against the providers at once, queues the rest in
+arrival order, and sheds load when the queue is full
+"""
+
+import threading
+import time
+from collections import deque
+
+import metrics
+from config import MAX_CONCURRENT_TURNS, MAX_QUEUED_TURNS, ADMISSION_TIMEOUT, CANCEL_POLL_INTERVAL
+
+
+class ServerBusyError(Exception):
+    """Raised when the wait queue is already full"""
+
+
+class AdmissionController:
+    """
+    Counting gate with a bounded FIFO wait queue. Waiters are told their
+    queue position whenever it changes.
+    """
+
+    def __init__(self, max_active=MAX_CONCURRENT_TURNS, max_queued=MAX_QUEUED_TURNS):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.active = 0
+        self.queue = deque()
+        self.cond = threading.Condition()
+
+    def saturated(self):
+        """True when new work would be rejected outright"""
+        with self.cond:
+            return self.active >= self.max_active and len(self.queue) >= self.max_queued
+
+    def acquire(self, on_position=None, cancel_event=None, timeout=ADMISSION_TIMEOUT):
+        """
+        Take a slot, waiting in line if needed. Returns False if the wait
+        was cancelled or timed out; raises ServerBusyError if the queue is full.
+        """
+        ticket = object()
+        with self.cond:
+            if self.active < self.max_active and not self.queue:
+                self.active += 1
+                metrics.incr("admission_admitted")
+                return True
+            if len(self.queue) >= self.max_queued:
+                metrics.incr("admission_rejected")
+                raise ServerBusyError("Server is at capacity, please try again shortly")
+            self.queue.append(ticket)
+            metrics.incr("admission_queued")
+
+        deadline = time.monotonic() + timeout
+        reported = None
+        while True:
+            with self.cond:
+                position = self.queue.index(ticket) + 1
+                if position == 1 and self.active < self.max_active:
+                    self.queue.popleft()
+                    self.active += 1
+                    self.cond.notify_all()  # Everyone behind us moved up
+                    metrics.incr("admission_admitted")
+                    return True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (cancel_event is not None and cancel_event.is_set()):
+                    self.queue.remove(ticket)
+                    self.cond.notify_all()
+                    metrics.incr("admission_abandoned" if remaining > 0 else "admission_timeouts")
+                    return False
+
+                if position == reported:
+                    self.cond.wait(min(remaining, CANCEL_POLL_INTERVAL))
+                    continue
+
+            # Report outside the lock; emitting can block on the socket
+            reported = position
+            if on_position:
+                on_position(position)
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {
+                "active": self.active,
+                "queued": len(self.queue),
+                "max_active": self.max_active,
+                "max_queued": self.max_queued
+            }
+
+
+# Shared by every socket connection
+admission = AdmissionController()
@@ -0,0 +1,179 @@
+"""
+AURA Analytics
+Per-room, per-day rollups of finished sessions, updated incrementally as
+each session is finalized so dashboards never scan the session history
+"""
+
+from datetime import datetime, timedelta
+
+from config import ANALYTICS_DEFAULT_DAYS, LATENCY_BUCKETS_MS
+from repositories import rollups as rollup_store, DatabaseUnavailableError
+
+
+def bucket_for(ms):
+    """Histogram field for a latency: the first upper bound it fits under"""
+    for bound in LATENCY_BUCKETS_MS:
+        if ms <= bound:
+            return f"le_{bound}"
+    return "le_inf"
+
+
+def _field(name):
+    # Agent names become document keys; MongoDB reserves '.' and a leading '$'
+    return name.replace(".", "_").replace("$", "_")
+
+
+class TurnStats:
+    """Latency histograms for one session, folded into its rollup at the end"""
+
+    def __init__(self):
+        self.turns = 0
+        self.interrupted_turns = 0
+        self.turn_ms = {}
+        self.agents = {}  # agent -> {"responses": n, "llm_ms": {...}, "total_ms": {...}}
+        # Answer-cache hits skip the LLM, so they get their own series rather
+        # than dragging the live latency percentiles down
+        self.cached_turns = 0
+        self.cached_turn_ms = {}
+
+    def add_turn(self, agent_timings, total_ms, interrupted=False, cached=False):
+        self.turns += 1
+        if interrupted:
+            self.interrupted_turns += 1
+        bucket = bucket_for(total_ms)
+        if cached:
+            self.cached_turns += 1
+            self.cached_turn_ms[bucket] = self.cached_turn_ms.get(bucket, 0) + 1
+            return
+        self.turn_ms[bucket] = self.turn_ms.get(bucket, 0) + 1
+        for timing in agent_timings:
+            agent = self.agents.setdefault(timing["agent"], {"responses": 0, "llm_ms": {}, "total_ms": {}})
+            agent["responses"] += 1
+            for stage, ms in (("llm_ms", timing["llm_ms"]),
+                              ("total_ms", timing["llm_ms"] + timing["tts_ms"] + timing["emit_ms"])):
+                bucket = bucket_for(ms)
+                agent[stage][bucket] = agent[stage].get(bucket, 0) + 1
+
+
+# ============================================================================
+# WRITES
+# ============================================================================
+
+def record_session(room_name, start_time, duration_seconds, stats, token_usage=None):
+    """Fold one finished session into its room/day rollup (one upsert)"""
+    increments = {
+        "sessions": 1,
+        "turns": stats.turns,
+        "interrupted_turns": stats.interrupted_turns,
+        "cached_turns": stats.cached_turns,
+        "duration_seconds": duration_seconds
+    }
+    if token_usage:
+        increments["prompt_tokens"] = token_usage.get("prompt_tokens", 0)
+        increments["completion_tokens"] = token_usage.get("completion_tokens", 0)
+    for bucket, count in stats.turn_ms.items():
+        increments[f"turn_ms.{bucket}"] = count
+    for bucket, count in stats.cached_turn_ms.items():
+        increments[f"cached_turn_ms.{bucket}"] = count
+    for name, agent in stats.agents.items():
+        prefix = f"agents.{_field(name)}"
+        increments[f"{prefix}.responses"] = agent["responses"]
+        for stage in ("llm_ms", "total_ms"):
+            for bucket, count in agent[stage].items():
+                increments[f"{prefix}.{stage}.{bucket}"] = count
+
+    try:
+        rollup_store.add(room_name, start_time.strftime("%Y-%m-%d"), increments, datetime.now())
+    except DatabaseUnavailableError:
+        return  # File-logging mode: nothing to roll up into
+    except Exception as e:
+        print(f"❌ Analytics rollup error: {e}")
+
+
+# ============================================================================
+# READS
+# ============================================================================
+
+def histogram_percentile(histogram, pct):
+    """
+    Upper bound of the bucket holding the pct-th percentile (None if empty;
+    anything past the last bucket reports the last bound)
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = total * pct / 100.0
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += histogram.get(f"le_{bound}", 0)
+        if seen >= rank:
+            return bound
+    return LATENCY_BUCKETS_MS[-1]
+
+
+def _merge(into, histogram):
+    for bucket, count in histogram.items():
+        into[bucket] = into.get(bucket, 0) + count
+
+
+def _summarize(rollups):
+    """Totals, averages and percentiles across one or more rollup documents"""
+    totals = {"sessions": 0, "turns": 0, "interrupted_turns": 0, "cached_turns": 0,
+              "duration_seconds": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    turn_ms = {}
+    cached_turn_ms = {}
+    agents = {}
+    for rollup in rollups:
+        for key in totals:
+            totals[key] += rollup.get(key, 0)
+        _merge(turn_ms, rollup.get("turn_ms", {}))
+        _merge(cached_turn_ms, rollup.get("cached_turn_ms", {}))
+        for name, agent in rollup.get("agents", {}).items():
+            merged = agents.setdefault(name, {"responses": 0, "llm_ms": {}, "total_ms": {}})
+            merged["responses"] += agent.get("responses", 0)
+            _merge(merged["llm_ms"], agent.get("llm_ms", {}))
+            _merge(merged["total_ms"], agent.get("total_ms", {}))
+
+    sessions = totals["sessions"] or 1
+    return {
+        **totals,
+        "avg_turns": totals["turns"] / sessions,
+        "avg_duration_seconds": totals["duration_seconds"] / sessions,
+        "turn_p50_ms": histogram_percentile(turn_ms, 50),
+        "turn_p95_ms": histogram_percentile(turn_ms, 95),
+        "cached_turn_p50_ms": histogram_percentile(cached_turn_ms, 50),
+        "cached_turn_p95_ms": histogram_percentile(cached_turn_ms, 95),
+        "agents": {
+            name: {
+                "responses": agent["responses"],
+                "llm_p50_ms": histogram_percentile(agent["llm_ms"], 50),
+                "llm_p95_ms": histogram_percentile(agent["llm_ms"], 95),
+                "total_p50_ms": histogram_percentile(agent["total_ms"], 50),
+                "total_p95_ms": histogram_percentile(agent["total_ms"], 95)
+            }
+            for name, agent in agents.items()
+        }
+    }
+
+
+def room_analytics(days=ANALYTICS_DEFAULT_DAYS, room=None):
+    """
+    Per-room summaries over the last `days` days, with a per-day breakdown.
+    Reads at most one small document per room per day.
+    """
+    since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    by_room = {}
+    for rollup in rollup_store.since(since, room):
+        by_room.setdefault(rollup["room"], []).append(rollup)
+
+    return {
+        "since": since,
+        "rooms": [
+            {
+                "room": name,
+                **_summarize(rollups),
+                "days": [{"day": r["day"], **_summarize([r])} for r in rollups]
+            }
+            for name, rollups in by_room.items()
+        ]
+    }
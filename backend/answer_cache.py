@@ -0,0 +1,190 @@
+"""
+AURA Answer Cache
+Opt-in per room ("answer_cache": true in rooms.json). The council's answer
+to an opening question is remembered and replayed when the same question
+(after normalization) or a near duplicate (MinHash over character
+shingles) opens another session. Audio comes from the audio store, so a
+hit costs neither LLM nor TTS calls.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from config import (
+    ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_SHINGLE_SIZE, ANSWER_CACHE_BANDS, ANSWER_CACHE_ROWS
+)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_NUM_HASHES = ANSWER_CACHE_BANDS * ANSWER_CACHE_ROWS
+
+
+def _hash_params():
+    # Fixed (a, b) pairs so signatures agree across restarts
+    params = []
+    for i in range(_NUM_HASHES):
+        digest = hashlib.blake2b(f"aura-minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % _MERSENNE_PRIME or 1
+        b = int.from_bytes(digest[8:], "big") % _MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+_HASH_PARAMS = _hash_params()
+
+
+def normalize_question(text):
+    """Lowercase words only, so punctuation and spacing never cause a miss"""
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+def minhash_signature(normalized):
+    """MinHash of the question's character shingles"""
+    size = ANSWER_CACHE_SHINGLE_SIZE
+    shingles = {normalized[i:i + size] for i in range(max(1, len(normalized) - size + 1))}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles
+    ]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _HASH_PARAMS
+    )
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def _bands(signature):
+    rows = ANSWER_CACHE_ROWS
+    return [(band, signature[band * rows:(band + 1) * rows]) for band in range(ANSWER_CACHE_BANDS)]
+
+
+class CachedAnswer:
+    """One stored council turn"""
+
+    __slots__ = ("question", "signature", "responses", "tokens", "tts_seconds", "created_at")
+
+    def __init__(self, question, signature, responses, tokens, tts_seconds=0):
+        self.question = question
+        self.signature = signature
+        self.responses = responses  # [(agent name, text)] in speaking order
+        self.tokens = tokens        # LLM tokens the original turn used
+        self.tts_seconds = tts_seconds  # Time it spent synthesizing speech
+        self.created_at = time.monotonic()
+
+
+class _RoomAnswers:
+    """LRU of one room's answers with an LSH index over their signatures"""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # normalized question -> CachedAnswer
+        self.buckets = {}             # (band, rows) -> {normalized question}
+
+    def add(self, answer):
+        self.remove(answer.question)
+        self.entries[answer.question] = answer
+        for band in _bands(answer.signature):
+            self.buckets.setdefault(band, set()).add(answer.question)
+        while len(self.entries) > ANSWER_CACHE_MAX_ENTRIES:
+            self.remove(next(iter(self.entries)))
+            metrics.incr("answer_cache_evictions")
+
+    def remove(self, question):
+        answer = self.entries.pop(question, None)
+        if answer is None:
+            return
+        for band in _bands(answer.signature):
+            bucket = self.buckets.get(band)
+            if bucket:
+                bucket.discard(question)
+                if not bucket:
+                    del self.buckets[band]
+
+    def candidates(self, signature):
+        found = set()
+        for band in _bands(signature):
+            found |= self.buckets.get(band, set())
+        return found
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class AnswerCache:
+    """Answers per room (keyed by room_id, so editing a room starts afresh)"""
+
+    def __init__(self):
+        self.rooms = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def enabled_for(room):
+        return bool(room.get('answer_cache'))
+
+    def lookup(self, room, question):
+        """Stored answer to `question` or a near duplicate, else None"""
+        room_key = room.get('room_id') or room['name']
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        signature = minhash_signature(normalized)
+
+        with self.lock:
+            answers = self.rooms.get(room_key)
+            answer = answers.entries.get(normalized) if answers else None
+            match = "exact"
+            if answer is None and answers:
+                best = 0
+                for candidate in answers.candidates(signature):
+                    score = similarity(signature, answers.entries[candidate].signature)
+                    if score >= ANSWER_CACHE_SIMILARITY and score > best:
+                        answer, best = answers.entries[candidate], score
+                match = "near"
+
+            if answer is not None and time.monotonic() - answer.created_at > ANSWER_CACHE_TTL:
+                answers.remove(answer.question)
+                answer = None
+            if answer is not None:
+                answers.entries.move_to_end(answer.question)
+
+        if answer is None:
+            metrics.incr("answer_cache_misses", room=room['name'])
+            return None
+        metrics.incr("answer_cache_hits", room=room['name'], match=match)
+        metrics.incr("answer_cache_llm_calls_saved", len(answer.responses), room=room['name'])
+        metrics.incr("answer_cache_tokens_saved", answer.tokens, room=room['name'])
+        # Replayed audio comes from the audio store rather than Deepgram
+        metrics.incr("answer_cache_tts_chars_saved", sum(len(text) for _, text in answer.responses),
+                     room=room['name'])
+        metrics.incr("answer_cache_tts_seconds_saved", answer.tts_seconds, room=room['name'])
+        print(f"♻️ Answer cache {match} hit: \"{question[:50]}\"")
+        return answer
+
+    def store(self, room, question, responses, tokens=0, tts_seconds=0):
+        """Remember a complete council turn for an opening question"""
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        answer = CachedAnswer(normalized, minhash_signature(normalized), list(responses), tokens, tts_seconds)
+        room_key = room.get('room_id') or room['name']
+        with self.lock:
+            self.rooms.setdefault(room_key, _RoomAnswers()).add(answer)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "rooms": len(self.rooms),
+                "entries": sum(len(answers.entries) for answers in self.rooms.values())
+            }
+
+
+# Shared by every session
+answer_cache = AnswerCache()
@@ -3,65 +3,111 @@ AURA - Multi-Agent Voice Assistant
 Main Flask application with modular structure
 """
 
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import os
 import json
-from flask import Flask, jsonify, request
+import zlib
+import threading
+from datetime import datetime
+from flask import Blueprint, Flask, Response, jsonify, request, send_file, send_from_directory
 from flask_socketio import SocketIO
 from flask_cors import CORS
 from bson import ObjectId # <-- ADDED: Needed to handle MongoDB IDs
 
 # Import configurations and modules
 from config import *
-from handlers import initialize_handlers, deepgram_client, cerebras_handler
+from handlers import initialize_handlers
 from socket_events import register_socket_events
-from database import db 
-
-import jwt
-from datetime import datetime, timedelta, timezone
-from user_model import create_user, check_password
-
+from database import initialize_mongodb, pool_stats
+from repositories import sessions, DatabaseUnavailableError
+import metrics
+from resilience import circuit_states
+from admission import admission
+from audio_store import get_audio_store
+from profiling import profiler, list_profiles
+from analytics import room_analytics
+from search import search_messages
+from archive import load_archived_session, start_archiver
+from answer_cache import answer_cache
+from rooms import room_registry, public_room, validate_room
 
-# Initialize handlers before creating socket events
-initialize_handlers()
+from auth import issue_token, require_admin, require_auth
+from user_model import create_user, check_password, find_user_by_email, HashingBusyError
 
 
-# ============================================================================
-# FLASK APP INITIALIZATION
-# ============================================================================
+api = Blueprint('api', __name__)
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = FLASK_SECRET_KEY
-CORS(app)
-
-socketio = SocketIO(
-    app,
-    cors_allowed_origins="*",
-    async_mode='threading'
-)
+# Filled in by create_app() and warm_up(); served by /ready
+startup_state = {
+    "ready": False,
+    "import_seconds": None,
+    "startup_seconds": None
+}
 
 
 # ============================================================================
 # FLASK ROUTES
 # ============================================================================
 
-@app.route('/')
+@api.route('/')
 def index():
     return {"message": "AURA Backend running!"}
 
 
-@app.route('/api/rooms', methods=['GET'])
+@api.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once database and provider clients are warm"""
+    status = 200 if startup_state["ready"] else 503
+    return jsonify(startup_state), status
+
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Provider, circuit-breaker, admission, answer-cache and MongoDB counters"""
+    return jsonify({
+        "counters": metrics.snapshot(),
+        "circuits": circuit_states(),
+        "admission": admission.stats(),
+        "answer_cache": answer_cache.stats(),
+        "mongo": pool_stats()
+    })
+
+
+@api.route('/api/audio/<clip_id>', methods=['GET'])
+def get_audio_clip(clip_id):
+    """Stored agent audio, with Range, ETag and long-lived caching"""
+    clip = get_audio_store().get(clip_id)
+    if clip is None:
+        return jsonify({"error": "Audio not found"}), 404
+    
+    # Clip ids are content hashes, so the bytes behind a URL never change
+    if clip.path:
+        response = send_file(
+            clip.path,
+            mimetype=clip.mime_type,
+            conditional=True,
+            etag=clip.clip_id,
+            max_age=AUDIO_CACHE_MAX_AGE
+        )
+    else:
+        response = Response(clip.data, mimetype=clip.mime_type)
+        response.set_etag(clip.clip_id)
+        response.cache_control.public = True
+        response.cache_control.max_age = AUDIO_CACHE_MAX_AGE
+        response = response.make_conditional(
+            request, accept_ranges=True, complete_length=len(clip.data)
+        )
+    response.cache_control.immutable = True
+    return response
+
+
+@api.route('/api/rooms', methods=['GET'])
 def get_rooms():
     """Get all available conversation rooms"""
     try:
-        with open(ROOMS_CONFIG_PATH, 'r', encoding='utf-8') as f:
-            rooms_data = json.load(f)
-        
-        for room in rooms_data.get('rooms', []):
-            for idx, agent in enumerate(room.get('agents', [])):
-                voice = agent.get('voice', '')
-                if not voice or not voice.startswith('aura-'):
-                    agent['voice'] = DEFAULT_VOICES[idx % len(DEFAULT_VOICES)]
-        
-        return jsonify(rooms_data)
+        return jsonify({"rooms": [public_room(room) for room in room_registry.builtin_rooms()]})
     
     except Exception as e:
         print(f"❌ Error loading rooms: {e}")
@@ -71,7 +117,7 @@ def get_rooms():
 # ---   AUTHENTICATION ROUTES ---
 # ============================================================================
 
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
 def register_user():
     try:
         data = request.json
@@ -86,10 +132,12 @@ def register_user():
 
     except ValueError as e:
         return jsonify({"error": str(e)}), 409 # 409 Conflict for existing user
+    except HashingBusyError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login_user():
     try:
         data = request.json
@@ -99,19 +147,12 @@ def login_user():
         if not email or not password:
             return jsonify({"error": "Email and password are required"}), 400
 
-        user = db.users.find_one({"email": email})
+        user = find_user_by_email(email)
 
         if not user or not check_password(user['password'], password):
             return jsonify({"error": "Invalid email or password"}), 401
 
-        # Create the token
-        payload = {
-            'sub': str(user['_id']), # Subject (the user's ID)
-            'iat': datetime.now(timezone.utc), # Issued at
-            'exp': datetime.now(timezone.utc) + timedelta(days=7) # Expiration
-        }
-        
-        token = jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+        token = issue_token(user['_id'])
 
         return jsonify({
             "message": "Login successful",
@@ -119,6 +160,10 @@ def login_user():
             "user": { "id": str(user['_id']), "email": user['email'] }
         })
 
+    except HashingBusyError as e:
+        return jsonify({"error": str(e)}), 503
+    except DatabaseUnavailableError as e:
+        return jsonify({"error": str(e)}), 500
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
@@ -128,35 +173,88 @@ def login_user():
 # --- NEW: API ENDPOINTS FOR MONGODB CONVERSATIONS ---
 # ============================================================================
 
-@app.route('/api/conversations', methods=['GET'])
+@api.route('/api/conversations', methods=['GET'])
+@require_auth
 def get_conversations():
     """Get a list of recent conversation summaries"""
-    if db is None:
-        return jsonify({"error": "Database not connected"}), 500
-    
     try:
-        sessions_cursor = db.sessions.find(
-            {"status": "completed"},
-            {"conversation": 0}
-        ).sort("start_time", -1).limit(50)
-        
-        sessions = []
-        for session in sessions_cursor:
+        summaries = sessions.recent_completed(limit=50)
+        for session in summaries:
             session['_id'] = str(session['_id'])
-            sessions.append(session)
             
-        return jsonify(sessions)
+        return jsonify(summaries)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/conversations/<session_id>', methods=['GET'])
+@api.route('/api/conversations/export', methods=['GET'])
+@require_auth
+def export_conversations():
+    """
+    Completed sessions as NDJSON, oldest first, streamed straight from a
+    cursor. Filters: ?room=, ?since= / ?until= (ISO dates). ?batch_size=
+    sets the cursor batch; ?gzip=1 compresses the stream.
+    """
+    try:
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+        batch_size = int(request.args.get('batch_size', EXPORT_BATCH_SIZE))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    batch_size = max(1, min(batch_size, EXPORT_MAX_BATCH_SIZE))
+    compress = request.args.get('gzip') == '1'
+    
+    try:
+        cursor = sessions.completed_cursor(request.args.get('room'), since, until, batch_size)
+    except DatabaseUnavailableError as e:
+        return jsonify({"error": str(e)}), 500
+    
+    def generate():
+        # gzip container framing (wbits=31) so clients can decode on the fly
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        buffer = []
+        buffered = 0
+        try:
+            for session in cursor:
+                line = json.dumps(session, default=_export_default, ensure_ascii=False) + "\n"
+                buffer.append(line)
+                buffered += len(line)
+                if buffered >= EXPORT_CHUNK_BYTES:
+                    chunk = "".join(buffer).encode('utf-8')
+                    buffer, buffered = [], 0
+                    chunk = compressor.compress(chunk) if compressor else chunk
+                    if chunk:
+                        yield chunk
+            chunk = "".join(buffer).encode('utf-8')
+            if compressor:
+                chunk = compressor.compress(chunk) + compressor.flush()
+            if chunk:
+                yield chunk
+        finally:
+            cursor.close()
+    
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename="conversations.ndjson"'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def _export_default(value):
+    """JSON for the BSON types in session documents"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+@api.route('/api/conversations/<session_id>', methods=['GET'])
+@require_auth
 def get_conversation_details(session_id):
     """Get the full details of a single conversation"""
-    if db is None:
-        return jsonify({"error": "Database not connected"}), 500
-        
     try:
-        session = db.sessions.find_one({"_id": ObjectId(session_id)})
+        # Older sessions may have been moved to the file archive
+        session = sessions.get(session_id) or load_archived_session(session_id)
         if session:
             session['_id'] = str(session['_id'])
             return jsonify(session)
@@ -164,9 +262,48 @@ def get_conversation_details(session_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@api.route('/api/search', methods=['GET'])
+@require_auth
+def search_conversations():
+    """
+    Messages matching ?q= (words, "phrases", -exclusions), best first, with
+    highlighted snippets. Filters: ?room=, ?since= / ?until=; paged by
+    ?page= and ?page_size=.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', SEARCH_PAGE_SIZE))
+        return jsonify(search_messages(query, request.args.get('room'), since, until, page, page_size))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/analytics', methods=['GET'])
+@require_auth
+def get_analytics():
+    """Per-room rollups for the last ?days= days (optionally one ?room=)"""
+    try:
+        days = int(request.args.get('days', ANALYTICS_DEFAULT_DAYS))
+    except ValueError:
+        return jsonify({"error": "days must be a whole number"}), 400
+    if not 1 <= days <= ANALYTICS_MAX_DAYS:
+        return jsonify({"error": f"days must be between 1 and {ANALYTICS_MAX_DAYS}"}), 400
+    
+    try:
+        return jsonify(room_analytics(days, request.args.get('room')))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # ============================================================================
 
-@app.route('/api/custom-room', methods=['POST'])
+@api.route('/api/custom-room', methods=['POST'])
+@require_auth
 def create_custom_room():
     """Create custom room with user-defined agents"""
     try:
@@ -177,11 +314,6 @@ def create_custom_room():
         if len(agents_data) != 3:
             return jsonify({"error": "Exactly 3 agents required"}), 400
         
-        if duration not in ALLOWED_DURATIONS:
-            return jsonify({
-                "error": f"Duration must be {' or '.join(map(str, ALLOWED_DURATIONS))} minutes"
-            }), 400
-        
         custom_room = {
             "name": "Custom Session",
             "description": "Your personalized AI conversation",
@@ -199,13 +331,88 @@ def create_custom_room():
                 "voice": agent.get('voice', DEFAULT_VOICES[idx])
             })
         
-        return jsonify({"room": custom_room, "success": True})
+        validate_room(custom_room)
+        room = room_registry.register(custom_room)
+        
+        # Clients start it with start_session({room_id}) instead of resending it
+        return jsonify({"room": public_room(room), "room_id": room['room_id'], "success": True})
     
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Error creating custom room: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+# ============================================================================
+# ADMIN ROUTES
+# ============================================================================
+
+@api.route('/api/admin/profiling', methods=['GET', 'POST'])
+@require_admin
+def turn_profiling():
+    """
+    Profiling triggers and written profiles. POST {mode, every_n_turns,
+    next_turns} to change them; next_turns profiles the next N turns.
+    """
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            profiler.configure(
+                mode=data.get('mode'),
+                every_n_turns=data.get('every_n_turns'),
+                next_turns=data.get('next_turns')
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify({**profiler.status(), "profiles": list_profiles()})
+
+
+@api.route('/api/admin/profiles/<name>', methods=['GET'])
+@require_admin
+def download_profile(name):
+    """One written profile (.pstats for snakeviz, .collapsed for flamegraph.pl)"""
+    return send_from_directory(os.path.abspath(PROFILES_DIR), name, as_attachment=True)
+
+
+# ============================================================================
+# APPLICATION FACTORY
+# ============================================================================
+
+def create_app():
+    """Build the Flask app and SocketIO server without touching providers"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = FLASK_SECRET_KEY
+    CORS(app)
+    app.register_blueprint(api)
+
+    socketio = SocketIO(
+        app,
+        cors_allowed_origins="*",
+        async_mode='threading'
+    )
+    register_socket_events(socketio)
+
+    startup_state["import_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    return app, socketio
+
+
+def warm_up():
+    """Connect MongoDB and create provider clients, then flip /ready"""
+    if initialize_mongodb() and ARCHIVE_ENABLED:
+        start_archiver()
+    initialize_handlers()
+
+    elapsed = time.perf_counter() - _IMPORT_STARTED
+    startup_state["startup_seconds"] = round(elapsed, 3)
+    startup_state["ready"] = True
+
+    if elapsed > STARTUP_TIME_BUDGET:
+        print(f"⚠️ Startup took {elapsed:.2f}s (budget {STARTUP_TIME_BUDGET:.1f}s)")
+    else:
+        print(f"✅ Ready in {elapsed:.2f}s")
+
+
 # ============================================================================
 # APPLICATION STARTUP
 # ============================================================================
@@ -217,26 +424,21 @@ if __name__ == '__main__':
         print("="*60)
         
         validate_config()
-        initialize_handlers()
-        register_socket_events(socketio)
-        
-        # --- MODIFIED: MongoDB is now initialized on startup ---
-        from database import initialize_mongodb
-        initialize_mongodb()
+        app, socketio = create_app()
+        threading.Thread(target=warm_up, daemon=True).start()
         
-        print("✅ All systems initialized")
-        print("🌐 Server: http://0.0.0.0:5000")
+        print(f"🌐 Server: http://{SERVER_HOST}:{SERVER_PORT}")
         print("="*60 + "\n")
         
         socketio.run(
             app,
-            debug=True,
-            host='0.0.0.0',
-            port=5000,
+            debug=DEBUG,
+            host=SERVER_HOST,
+            port=SERVER_PORT,
             allow_unsafe_werkzeug=True
         )
         
     except Exception as e:
         print(f"\n❌ Startup Error: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
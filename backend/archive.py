@@ -0,0 +1,189 @@
+"""
+AURA Session Archive
+Moves completed sessions older than ARCHIVE_AFTER_DAYS out of MongoDB into
+gzipped, date-partitioned JSONL files under LOGS_DIR/archive. Each session
+is its own gzip member, and archived_sessions records where it lives, so a
+single session can still be read back without decompressing the whole file.
+The session's rows in the messages search collection are deleted with it
+(its conversation is in the archived document), so neither the hot
+collections nor the text index grow with history.
+
+Run once by hand with:
+    python archive.py --older-than-days 90
+"""
+
+import argparse
+import gzip
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import json_util
+
+from config import ARCHIVE_DIR, ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL, ARCHIVE_BATCH_SIZE
+from repositories import sessions as session_store, messages, archived_sessions
+
+
+def archive_path(day):
+    """LOGS_DIR/archive/YYYY/MM/sessions-YYYY-MM-DD.jsonl.gz"""
+    return os.path.join(ARCHIVE_DIR, f"{day:%Y}", f"{day:%m}", f"sessions-{day:%Y-%m-%d}.jsonl.gz")
+
+
+def _pending_path(path):
+    return path + ".pending"
+
+
+def _recover(path):
+    """
+    Undo an append whose index entries were never committed: drop any that
+    did land and truncate the partition back to its size before the append.
+    The sessions are still in MongoDB, so they are simply archived again.
+    """
+    pending = _pending_path(path)
+    if not os.path.exists(pending):
+        return
+    with open(pending, "r", encoding="utf-8") as f:
+        size = int(f.read().strip() or 0)
+    archived_sessions.discard_from(os.path.relpath(path, ARCHIVE_DIR), size)
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            os.fsync(f.fileno())
+        print(f"🧹 Truncated uncommitted archive data from {path}")
+    os.remove(pending)
+
+
+def _append(path, sessions):
+    """
+    Append sessions to a partition, one gzip member each (concatenated
+    members are still a valid gzip file). Returns [(session, offset, length)].
+    The size before appending is kept in a .pending file until _commit, so
+    a crash in between can be rolled back by _recover.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(_pending_path(path), "w", encoding="utf-8") as f:
+        f.write(str(os.path.getsize(path) if os.path.exists(path) else 0))
+        f.flush()
+        os.fsync(f.fileno())
+
+    written = []
+    with open(path, "ab") as f:
+        for session in sessions:
+            line = json_util.dumps(session) + "\n"
+            member = gzip.compress(line.encode("utf-8"))
+            offset = f.tell()
+            f.write(member)
+            written.append((session, offset, len(member)))
+        f.flush()
+        os.fsync(f.fileno())
+    return written
+
+
+def _commit(path):
+    """The appended members are indexed; they're no longer rolled back"""
+    os.remove(_pending_path(path))
+
+
+# ============================================================================
+# ARCHIVING
+# ============================================================================
+
+def archive_old_sessions(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive one batch of old completed sessions. Files are written and
+    indexed before anything is deleted; an append that was never indexed is
+    truncated away by the next run. Returns how many were moved.
+    """
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    sessions = session_store.completed_before(cutoff, batch_size)
+    if not sessions:
+        return 0
+
+    # Roll back interrupted appends first: their index entries are dropped,
+    # so those sessions count as not yet archived
+    for day in {session["start_time"].date() for session in sessions}:
+        _recover(archive_path(day))
+
+    # Already indexed by an earlier run that stopped before deleting
+    indexed = archived_sessions.indexed_ids(s["_id"] for s in sessions)
+
+    by_day = {}
+    for session in sessions:
+        if session["_id"] not in indexed:
+            by_day.setdefault(session["start_time"].date(), []).append(session)
+
+    for day, day_sessions in by_day.items():
+        path = archive_path(day)
+        entries = [
+            {
+                "_id": session["_id"],
+                "path": os.path.relpath(path, ARCHIVE_DIR),
+                "offset": offset,
+                "length": length,
+                "room_name": session.get("room_name"),
+                "start_time": session["start_time"],
+                "archived_at": datetime.now()
+            }
+            for session, offset, length in _append(path, day_sessions)
+        ]
+        archived_sessions.insert_many(entries)
+        _commit(path)
+
+    ids = [s["_id"] for s in sessions]
+    messages.delete_for_sessions(ids)
+    session_store.delete_many(ids)
+    print(f"🗄️ Archived {len(ids)} sessions older than {older_than_days} days")
+    return len(ids)
+
+
+def archive_all(older_than_days=ARCHIVE_AFTER_DAYS):
+    """Archive batches until nothing old enough is left"""
+    total = 0
+    while True:
+        moved = archive_old_sessions(older_than_days)
+        if not moved:
+            return total
+        total += moved
+
+
+def load_archived_session(session_id):
+    """An archived session document by id, or None"""
+    entry = archived_sessions.get(session_id)
+    if entry is None:
+        return None
+    with open(os.path.join(ARCHIVE_DIR, entry["path"]), "rb") as f:
+        f.seek(entry["offset"])
+        member = f.read(entry["length"])
+    return json_util.loads(gzip.decompress(member))
+
+
+# ============================================================================
+# BACKGROUND JOB
+# ============================================================================
+
+def start_archiver(interval=ARCHIVE_INTERVAL):
+    """Archive on a daemon thread every `interval` seconds"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                archive_all()
+            except Exception as e:
+                print(f"❌ Archive error: {e}")
+
+    thread = threading.Thread(target=run, name="session-archiver", daemon=True)
+    thread.start()
+    print(f"🗄️ Archiving sessions older than {ARCHIVE_AFTER_DAYS} days every {interval}s")
+    return thread
+
+
+if __name__ == "__main__":
+    from database import initialize_mongodb
+
+    parser = argparse.ArgumentParser(description="Archive old AURA sessions to compressed files")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+    if not initialize_mongodb():
+        raise SystemExit(1)
+    print(f"✅ Archived {archive_all(args.older_than_days)} sessions")
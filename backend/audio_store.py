@@ -0,0 +1,198 @@
+"""
+AURA Audio Store
+Content-addressed storage for synthesized clips, served by URL from
+/api/audio/<clip_id> instead of being pushed through the socket
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from config import (
+    TTS_FORMATS, AUDIO_STORE_BACKEND, AUDIO_STORE_DIR,
+    AUDIO_STORE_MAX_BYTES, AUDIO_STORE_MAX_KEYS
+)
+
+
+CLIP_ID_PATTERN = re.compile(r"^[0-9a-f]{32}\.([a-z0-9]+)$")
+
+
+def clip_id_for(audio_bytes, audio_format):
+    """<content hash>.<format>, so identical audio is only stored once"""
+    return f"{hashlib.sha256(audio_bytes).hexdigest()[:32]}.{audio_format}"
+
+
+def synthesis_key(text, voice, audio_format):
+    """Key for audio that has already been synthesized for this text and voice"""
+    return hashlib.sha256(f"{voice}|{audio_format}|{text}".encode("utf-8")).hexdigest()
+
+
+def parse_clip_id(clip_id):
+    """Audio format of a well-formed clip id, else None"""
+    match = CLIP_ID_PATTERN.match(clip_id)
+    if not match or match.group(1) not in TTS_FORMATS:
+        return None
+    return match.group(1)
+
+
+class ClipRef:
+    """Where a stored clip lives: a file path (disk) or bytes (memory)"""
+
+    __slots__ = ("clip_id", "mime_type", "path", "data")
+
+    def __init__(self, clip_id, mime_type, path=None, data=None):
+        self.clip_id = clip_id
+        self.mime_type = mime_type
+        self.path = path
+        self.data = data
+
+
+# ============================================================================
+# STORES
+# ============================================================================
+
+class _BaseAudioStore:
+
+    def __init__(self, max_bytes=AUDIO_STORE_MAX_BYTES, max_keys=AUDIO_STORE_MAX_KEYS):
+        self.max_bytes = max_bytes
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.keys = OrderedDict()  # synthesis key -> clip id
+
+    def put(self, audio_bytes, audio_format, key=None):
+        """Store a clip (once) and return its clip id"""
+        clip_id = clip_id_for(audio_bytes, audio_format)
+        self._store(clip_id, audio_bytes)
+        if key:
+            with self.lock:
+                self.keys[key] = clip_id
+                self.keys.move_to_end(key)
+                while len(self.keys) > self.max_keys:
+                    self.keys.popitem(last=False)
+        return clip_id
+
+    def find(self, key):
+        """Clip id previously stored under `key`, if it is still available"""
+        with self.lock:
+            clip_id = self.keys.get(key)
+        if clip_id and self.get(clip_id):
+            return clip_id
+        return None
+
+    def read(self, clip_id):
+        """Raw bytes of a stored clip, or None"""
+        clip = self.get(clip_id)
+        if clip is None:
+            return None
+        if clip.data is not None:
+            return clip.data
+        try:
+            with open(clip.path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+class MemoryAudioStore(_BaseAudioStore):
+    """LRU of clips bounded by total bytes; nothing survives a restart"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.clips = OrderedDict()
+        self.total_bytes = 0
+
+    def _store(self, clip_id, audio_bytes):
+        with self.lock:
+            if clip_id in self.clips:
+                self.clips.move_to_end(clip_id)
+                return
+            self.clips[clip_id] = audio_bytes
+            self.total_bytes += len(audio_bytes)
+            while self.total_bytes > self.max_bytes and len(self.clips) > 1:
+                _, evicted = self.clips.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def get(self, clip_id):
+        audio_format = parse_clip_id(clip_id)
+        if audio_format is None:
+            return None
+        with self.lock:
+            data = self.clips.get(clip_id)
+            if data is None:
+                return None
+            self.clips.move_to_end(clip_id)
+        return ClipRef(clip_id, TTS_FORMATS[audio_format]["mime_type"], data=data)
+
+
+class DiskAudioStore(_BaseAudioStore):
+    """One file per clip under AUDIO_STORE_DIR, oldest pruned past max_bytes"""
+
+    def __init__(self, directory=AUDIO_STORE_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.is_file()
+        )
+
+    def _path(self, clip_id):
+        return os.path.join(self.directory, clip_id)
+
+    def _store(self, clip_id, audio_bytes):
+        path = self._path(clip_id)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio_bytes)
+        os.replace(tmp_path, path)  # Readers never see a partial clip
+
+        with self.lock:
+            self.total_bytes += len(audio_bytes)
+            over_budget = self.total_bytes > self.max_bytes
+        if over_budget:
+            self._prune()
+
+    def _prune(self):
+        entries = sorted(
+            (e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp")),
+            key=lambda e: e.stat().st_mtime
+        )
+        total = sum(e.stat().st_size for e in entries)
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+            except OSError:
+                continue
+        with self.lock:
+            self.total_bytes = total
+        print(f"🧹 Audio store pruned to {total / 1e6:.1f} MB")
+
+    def get(self, clip_id):
+        audio_format = parse_clip_id(clip_id)
+        if audio_format is None:
+            return None
+        path = self._path(clip_id)
+        if not os.path.isfile(path):
+            return None
+        return ClipRef(clip_id, TTS_FORMATS[audio_format]["mime_type"], path=path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_audio_store():
+    """Shared store, created on first use (AUDIO_STORE_BACKEND: disk or memory)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MemoryAudioStore() if AUDIO_STORE_BACKEND == "memory" else DiskAudioStore()
+        return _store
@@ -0,0 +1,129 @@
+"""
+AURA Authentication
+Issues JWTs at login and verifies them for socket connects and API calls,
+caching decoded tokens so repeat checks skip signature verification
+"""
+
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+import jwt
+from flask import g, jsonify, request
+
+from config import (
+    FLASK_SECRET_KEY, JWT_EXPIRY_DAYS, JWT_CACHE_SIZE, JWT_CACHE_TTL, REQUIRE_AUTH, ADMIN_TOKEN
+)
+
+
+# token -> (claims, trusted_until)
+_token_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# ============================================================================
+# TOKENS
+# ============================================================================
+
+def issue_token(user_id):
+    """Signed JWT for a logged-in user"""
+    now = datetime.now(timezone.utc)
+    payload = {
+        'sub': str(user_id),  # Subject (the user's ID)
+        'iat': now,           # Issued at
+        'exp': now + timedelta(days=JWT_EXPIRY_DAYS)
+    }
+    return jwt.encode(payload, FLASK_SECRET_KEY, algorithm='HS256')
+
+
+def verify_token(token):
+    """Decoded claims for a valid token, or None"""
+    if not token:
+        return None
+
+    now = time.time()
+    with _cache_lock:
+        cached = _token_cache.get(token)
+        if cached is not None:
+            claims, trusted_until = cached
+            if now < trusted_until:
+                _token_cache.move_to_end(token)
+                return claims
+            del _token_cache[token]
+
+    try:
+        claims = jwt.decode(token, FLASK_SECRET_KEY, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+
+    # Never trust a cached token past its own expiry
+    trusted_until = min(now + JWT_CACHE_TTL, claims.get('exp', now))
+    with _cache_lock:
+        _token_cache[token] = (claims, trusted_until)
+        _token_cache.move_to_end(token)
+        while len(_token_cache) > JWT_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return claims
+
+
+def token_from_request():
+    """Bearer token from the Authorization header (or ?token= for sockets)"""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip()
+    return request.args.get('token')
+
+
+# ============================================================================
+# GUARDS
+# ============================================================================
+
+def require_auth(view):
+    """
+    Sets g.user_id from the request's token. While REQUIRE_AUTH is on, a
+    missing or invalid token gets 401; otherwise an invalid one is treated
+    as anonymous, like no token at all, so open routes stay open.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = token_from_request()
+        claims = verify_token(token)
+        if token and claims is None and REQUIRE_AUTH:
+            return jsonify({"error": "Invalid or expired token"}), 401
+        if claims is None and REQUIRE_AUTH:
+            return jsonify({"error": "Authentication required"}), 401
+        g.user_id = claims['sub'] if claims else None
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def require_admin(view):
+    """
+    Operator-only routes: need X-Admin-Token to match ADMIN_TOKEN, and
+    don't exist at all when ADMIN_TOKEN is unset
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        supplied = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(supplied.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+            return jsonify({"error": "Admin token required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def authenticate_socket(auth):
+    """
+    User id for a connecting socket (from the Socket.IO auth payload or the
+    token query parameter). Returns False when the connection must be refused.
+    """
+    token = (auth or {}).get('token') if isinstance(auth, dict) else None
+    token = token or token_from_request()
+    claims = verify_token(token)
+    if claims is None and REQUIRE_AUTH:
+        return False
+    return claims['sub'] if claims else None
@@ -0,0 +1,4 @@
+"""
+AURA Benchmarks
+Offline load testing against local stand-ins for Cerebras and Deepgram
+"""
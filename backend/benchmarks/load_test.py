@@ -0,0 +1,427 @@
+"""
+AURA Load Test
+Drives N concurrent Socket.IO clients through start_session -> process_audio
+-> end_session against a server wired to local stand-in providers.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --sessions 20 --turns 3
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+import socketio
+
+from benchmarks.report import summarize, format_summary
+from benchmarks.stub_servers import FaultProfile, start_llm_server, start_deepgram_server
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Unreachable MongoDB with a short selection timeout so the server starts
+# quickly and runs without persistence unless --mongo-uri is given
+NO_MONGO_URI = "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200&connectTimeoutMS=200"
+
+
+# ============================================================================
+# INPUT AUDIO
+# ============================================================================
+
+def generate_input_audio(seconds=1.5):
+    """Create a short WebM/Opus clip like the browser MediaRecorder sends"""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-ac", "1", "-ar", "48000", "-c:a", "libopus", "-f", "webm", "pipe:1"
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed: {result.stderr.decode()}")
+    return result.stdout
+
+
+def load_input_audio(path):
+    if path:
+        with open(path, "rb") as f:
+            return f.read()
+    return generate_input_audio()
+
+
+# ============================================================================
+# SERVER PROCESS
+# ============================================================================
+
+def start_server(port, llm_url, deepgram_url, mongo_uri, extra_env=None):
+    """Launch app.py as a child process pointed at the stand-ins"""
+    env = dict(os.environ)
+    env.update({
+        "AURA_PORT": str(port),
+        "AURA_HOST": "127.0.0.1",
+        "AURA_DEBUG": "0",
+        "CEREBRAS_API_KEY": "stub-key",
+        "DEEPGRAM_API_KEY": "stub-key",
+        "CEREBRAS_BASE_URL": f"{llm_url}/v1/chat/completions",
+        "DEEPGRAM_BASE_URL": deepgram_url,
+        "MONGO_URI": mongo_uri,
+        "AUDIO_STORE_BACKEND": "memory",  # Keep load-test clips out of audio_cache/
+        "PYTHONUNBUFFERED": "1"
+    })
+    env.update(extra_env or {})
+
+    return subprocess.Popen(
+        [sys.executable, "app.py"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def wait_for_server(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/ready", timeout=1).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+# ============================================================================
+# SIMULATED CLIENT
+# ============================================================================
+
+class SimulatedClient:
+    """One Socket.IO client running a full session"""
+
+    def __init__(self, server_url, audio_b64, room_index, turns, turn_timeout,
+                 audio_formats=None, stream_audio=False, audio_urls=False):
+        self.server_url = server_url
+        self.audio_formats = audio_formats
+        self.stream_audio = stream_audio
+        self.audio_urls = audio_urls
+        self.audio_b64 = audio_b64
+        self.room_index = room_index
+        self.turns = turns
+        self.turn_timeout = turn_timeout
+
+        self.turn_latencies = []
+        self.first_response_latencies = []
+        self.first_audio_latencies = []
+        self.audio_payload_bytes = []
+        self.errors = []
+        self.queued_turns = 0
+        self.rejections = 0
+
+        self._events = {}
+        self._turn_started = 0
+        self._first_response_seen = False
+        self._first_audio_seen = False
+        self._queued_this_turn = False
+        self._sio = socketio.Client(reconnection=False)
+        self._register()
+
+    def _event(self, name):
+        if name not in self._events:
+            self._events[name] = threading.Event()
+        return self._events[name]
+
+    def _register(self):
+        sio = self._sio
+
+        @sio.on('session_started')
+        def on_started(data):
+            self._event('session_started').set()
+
+        @sio.on('agent_response')
+        def on_agent_response(data):
+            if data.get('audio'):
+                self.audio_payload_bytes.append(len(data['audio']))
+                self._mark_first_audio()
+            elif data.get('audio_url'):
+                # Fetch the clip like a browser would; the socket only carried the URL
+                clip = requests.get(f"{self.server_url}{data['audio_url']}", timeout=self.turn_timeout)
+                if clip.ok:
+                    self._mark_first_audio()
+            if not self._first_response_seen:
+                self._first_response_seen = True
+                self.first_response_latencies.append(
+                    (time.perf_counter() - self._turn_started) * 1000
+                )
+
+        @sio.on('agent_audio_chunk')
+        def on_audio_chunk(data):
+            if data.get('audio'):
+                self._mark_first_audio()
+
+        @sio.on('processing_complete')
+        def on_complete(data):
+            # Let the server drop this turn's replay buffer
+            sio.emit('ack', {'event_seq': data.get('event_seq')})
+            self._event('turn_done').set()
+
+        @sio.on('session_ended')
+        def on_ended(data):
+            self._event('session_ended').set()
+
+        @sio.on('queued')
+        def on_queued(data):
+            if data.get('position') is not None and not self._queued_this_turn:
+                self._queued_this_turn = True
+                self.queued_turns += 1
+
+        @sio.on('server_busy')
+        def on_server_busy(data):
+            self.rejections += 1
+            on_error({'message': 'server busy'})
+
+        @sio.on('error')
+        def on_error(data):
+            self.errors.append(data.get('message', 'unknown error'))
+            self._event('turn_done').set()
+            self._event('session_started').set()
+
+    def _mark_first_audio(self):
+        if not self._first_audio_seen:
+            self._first_audio_seen = True
+            self.first_audio_latencies.append((time.perf_counter() - self._turn_started) * 1000)
+
+    def run(self, start_barrier):
+        try:
+            self._sio.connect(self.server_url, transports=['websocket'])
+            start_barrier.wait()
+
+            self._sio.emit('start_session', {
+                'room_index': self.room_index,
+                'audio_formats': self.audio_formats,
+                'stream_audio': self.stream_audio,
+                'audio_delivery': 'url' if self.audio_urls else 'inline'
+            })
+            if not self._event('session_started').wait(self.turn_timeout):
+                self.errors.append('session_started timeout')
+                return
+
+            for _ in range(self.turns):
+                self._event('turn_done').clear()
+                self._first_response_seen = False
+                self._first_audio_seen = False
+                self._queued_this_turn = False
+                errors_before = len(self.errors)
+                self._turn_started = time.perf_counter()
+
+                self._sio.emit('process_audio', {'audio': self.audio_b64})
+                if not self._event('turn_done').wait(self.turn_timeout):
+                    self.errors.append('turn timeout')
+                    continue
+                if len(self.errors) == errors_before:
+                    self.turn_latencies.append(
+                        (time.perf_counter() - self._turn_started) * 1000
+                    )
+
+            self._sio.emit('end_session')
+            self._event('session_ended').wait(self.turn_timeout)
+
+        except Exception as e:
+            self.errors.append(str(e))
+        finally:
+            try:
+                self._sio.disconnect()
+            except Exception:
+                pass
+
+
+# ============================================================================
+# LOAD TEST RUN
+# ============================================================================
+
+def run_load_test(args):
+    llm_faults = FaultProfile(args.llm_latency_ms, args.llm_jitter_ms,
+                              args.llm_error_rate, args.llm_rate_limit_rate, seed=1,
+                              slow_rate=args.llm_slow_rate, slow_ms=args.llm_slow_ms)
+    dg_faults = FaultProfile(args.tts_latency_ms, args.tts_jitter_ms,
+                             args.tts_error_rate, 0.0, seed=2)
+
+    llm = start_llm_server(faults=llm_faults, reply_words=args.reply_words,
+                           token_interval_ms=args.token_interval_ms)
+    deepgram = start_deepgram_server(faults=dg_faults)
+    print(f"🧪 Fake Cerebras at {llm.url}, fake Deepgram at {deepgram.url}")
+
+    extra_env = {
+        "HEDGE_ENABLED": "0" if args.no_hedge else "1",
+        # The server's process-wide LLM throttle; left at its 1s default it
+        # serializes concurrent sessions and the latencies measure the gate
+        "MIN_REQUEST_INTERVAL": str(args.min_request_interval)
+    }
+    if args.max_concurrent_turns:
+        extra_env["MAX_CONCURRENT_TURNS"] = str(args.max_concurrent_turns)
+    if args.max_queued_turns is not None:
+        extra_env["MAX_QUEUED_TURNS"] = str(args.max_queued_turns)
+    secondary = None
+    if args.secondary_llm_latency_ms is not None:
+        secondary = start_llm_server(
+            faults=FaultProfile(args.secondary_llm_latency_ms, args.llm_jitter_ms, seed=3),
+            reply_words=args.reply_words, token_interval_ms=args.token_interval_ms
+        )
+        extra_env["CEREBRAS_SECONDARY_URL"] = f"{secondary.url}/v1/chat/completions"
+        print(f"🧪 Secondary fake Cerebras at {secondary.url}")
+
+    server = None
+    server_url = args.server_url
+    if not server_url:
+        server_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, llm.url, deepgram.url,
+                              args.mongo_uri or NO_MONGO_URI, extra_env)
+        if not wait_for_server(server_url):
+            server.kill()
+            raise RuntimeError("AURA server did not come up")
+        print(f"🚀 AURA server started (pid {server.pid}) at {server_url}")
+
+    audio_b64 = base64.b64encode(load_input_audio(args.audio)).decode("utf-8")
+    # After ffmpeg has generated the input clip, so only the server is counted
+    cpu_before = os.times()
+    clients = [
+        SimulatedClient(server_url, audio_b64, args.room_index, args.turns, args.turn_timeout,
+                        args.audio_formats.split(",") if args.audio_formats else None,
+                        args.stream_audio, args.audio_urls)
+        for _ in range(args.sessions)
+    ]
+    barrier = threading.Barrier(args.sessions)
+    threads = [threading.Thread(target=c.run, args=(barrier,)) for c in clients]
+
+    print(f"🏃 Running {args.sessions} sessions x {args.turns} turns...")
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_seconds = time.perf_counter() - started
+
+    server_cpu = None
+    if server:
+        server.terminate()
+        server.wait(timeout=10)
+        cpu_after = os.times()
+        server_cpu = (
+            (cpu_after.children_user - cpu_before.children_user)
+            + (cpu_after.children_system - cpu_before.children_system)
+        )
+
+    llm.stop()
+    deepgram.stop()
+    if secondary:
+        secondary.stop()
+
+    turn_latencies = [v for c in clients for v in c.turn_latencies]
+    first_latencies = [v for c in clients for v in c.first_response_latencies]
+    first_audio = [v for c in clients for v in c.first_audio_latencies]
+    errors = [e for c in clients for e in c.errors]
+    audio_payloads = [v for c in clients for v in c.audio_payload_bytes]
+    cores_used = server_cpu / wall_seconds if server_cpu else None
+
+    return {
+        "sessions": args.sessions,
+        "turns_per_session": args.turns,
+        # Unknown for --server-url: the external server has its own setting
+        "min_request_interval": None if args.server_url else args.min_request_interval,
+        "completed_turns": len(turn_latencies),
+        "errors": len(errors),
+        "queued_turns": sum(c.queued_turns for c in clients),
+        "rejections": sum(c.rejections for c in clients),
+        "error_samples": errors[:10],
+        "wall_seconds": wall_seconds,
+        "turns_per_second": len(turn_latencies) / wall_seconds if wall_seconds else 0,
+        "turn_latency_ms": summarize(turn_latencies),
+        "first_response_latency_ms": summarize(first_latencies),
+        "first_audio_latency_ms": summarize(first_audio),
+        "avg_audio_payload_bytes": sum(audio_payloads) / len(audio_payloads) if audio_payloads else 0,
+        "server_cpu_seconds": server_cpu,
+        "cores_used": cores_used,
+        # Concurrent sessions one fully busy core could sustain at this load
+        "sessions_per_core": args.sessions / cores_used if cores_used else None,
+        "provider_stats": {
+            "llm": llm.stats,
+            "llm_secondary": secondary.stats if secondary else None,
+            "deepgram": deepgram.stats
+        }
+    }
+
+
+def print_report(result):
+    print("\n" + "=" * 60)
+    print("📊 AURA Load Test Report")
+    print("=" * 60)
+    print(f"Sessions: {result['sessions']}  Turns/session: {result['turns_per_session']}")
+    interval = result['min_request_interval']
+    print(f"LLM request throttle: {'server setting' if interval is None else f'{interval:g}s'}")
+    print(f"Completed turns: {result['completed_turns']}  Errors: {result['errors']}")
+    print(f"Queued turns: {result['queued_turns']}  Rejected (server busy): {result['rejections']}")
+    print(f"Wall time: {result['wall_seconds']:.1f}s  "
+          f"Throughput: {result['turns_per_second']:.2f} turns/s")
+    print(format_summary("Turn latency", result['turn_latency_ms']))
+    print(format_summary("First agent response", result['first_response_latency_ms']))
+    print(format_summary("First audio", result['first_audio_latency_ms']))
+    print(f"Avg audio payload per agent response: {result['avg_audio_payload_bytes'] / 1024:.1f} KB")
+    if result['sessions_per_core'] is not None:
+        print(f"Server CPU: {result['server_cpu_seconds']:.1f}s "
+              f"({result['cores_used']:.2f} cores)  "
+              f"Sessions/core: {result['sessions_per_core']:.1f}")
+    else:
+        print("Server CPU: n/a (external server)")
+    for sample in result['error_samples']:
+        print(f"   ❌ {sample}")
+    print("=" * 60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AURA offline load test")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent clients")
+    parser.add_argument("--turns", type=int, default=3, help="process_audio turns per session")
+    parser.add_argument("--room-index", type=int, default=0)
+    parser.add_argument("--audio", help="WebM/OGG clip to send (default: generated tone)")
+    parser.add_argument("--audio-formats", help="TTS formats the clients accept, e.g. opus,mp3,wav")
+    parser.add_argument("--stream-audio", action="store_true", help="Request chunked TTS audio")
+    parser.add_argument("--audio-urls", action="store_true", help="Receive clips by URL instead of inline")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--server-url", help="Use an already running server instead of spawning one")
+    parser.add_argument("--mongo-uri", help="MongoDB for the spawned server (default: disabled)")
+    parser.add_argument("--turn-timeout", type=float, default=120)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="Fraction of slow-tail LLM requests")
+    parser.add_argument("--llm-slow-ms", type=float, default=0, help="Extra latency of slow-tail requests")
+    parser.add_argument("--secondary-llm-latency-ms", type=float, help="Start a secondary LLM endpoint")
+    parser.add_argument("--min-request-interval", type=float, default=0.0,
+                        help="Spawned server's MIN_REQUEST_INTERVAL in seconds (default: no throttle)")
+    parser.add_argument("--no-hedge", action="store_true", help="Disable LLM request hedging")
+    parser.add_argument("--token-interval-ms", type=float, default=5)
+    parser.add_argument("--reply-words", type=int, default=40)
+    parser.add_argument("--tts-latency-ms", type=float, default=200)
+    parser.add_argument("--tts-jitter-ms", type=float, default=50)
+    parser.add_argument("--tts-error-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrent-turns", type=int, help="Server admission cap")
+    parser.add_argument("--max-queued-turns", type=int, help="Server admission queue length")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    result = run_load_test(args)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
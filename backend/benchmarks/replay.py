@@ -0,0 +1,308 @@
+"""
+AURA Trace Replay
+Replays recorded sessions from the `sessions` collection through the live
+SessionManager pipeline with deterministic stub providers, and compares
+per-stage latencies against a stored baseline.
+
+Usage (from backend/):
+    python -m benchmarks.replay --limit 200 --save-baseline benchmarks/replay_baseline.json
+    python -m benchmarks.replay --limit 200 --baseline benchmarks/replay_baseline.json
+"""
+
+import argparse
+import base64
+import json
+import sys
+import time
+from datetime import datetime
+
+from config import (
+    MONGO_URI, MONGO_DB_NAME, ROOMS_CONFIG_PATH, DEFAULT_VOICES,
+    TTS_FORMATS, DEFAULT_TTS_FORMAT, TTS_STREAM_CHUNK_BYTES
+)
+from session import SessionManager
+from benchmarks.report import summarize, format_summary
+from benchmarks.stub_servers import FILLER_WORDS, synthesize_audio
+
+
+STAGES = ("llm_ms", "tts_ms", "emit_ms", "turn_ms")
+
+
+# ============================================================================
+# TRACE LOADING
+# ============================================================================
+
+def load_sessions_from_mongo(uri, db_name, limit, room=None):
+    """Read completed sessions, oldest first, from MongoDB"""
+    from pymongo import MongoClient
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    query = {"status": "completed"}
+    if room:
+        query["room_name"] = room
+
+    cursor = client[db_name].sessions.find(query).sort("start_time", 1).limit(limit)
+    sessions = list(cursor)
+    client.close()
+    return sessions
+
+
+def load_sessions_from_file(path):
+    """Read sessions from a JSON array or NDJSON export"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def build_trace(session_doc):
+    """
+    Split a session's conversation into user turns, each with the agent
+    entries that followed it and the recorded wall time of the turn
+    """
+    turns = []
+    current = None
+
+    for entry in session_doc.get("conversation", []):
+        if entry.get("role") == "user":
+            current = {
+                "user_text": entry.get("content", ""),
+                "started": _parse_timestamp(entry.get("timestamp")),
+                "agents": [],
+                "recorded_ms": None
+            }
+            turns.append(current)
+        elif current is not None and entry.get("agent"):
+            current["agents"].append({
+                "agent": entry["agent"],
+                "length": len(entry.get("content", ""))
+            })
+            finished = _parse_timestamp(entry.get("timestamp"))
+            if current["started"] and finished:
+                current["recorded_ms"] = (finished - current["started"]).total_seconds() * 1000
+
+    return [t for t in turns if t["agents"]]
+
+
+def resolve_room(room_name, turns, rooms):
+    """Find the recorded room in rooms.json, or rebuild a stand-in from the trace"""
+    for room in rooms:
+        if room["name"] == room_name:
+            return room
+
+    agent_names = []
+    for turn in turns:
+        for entry in turn["agents"]:
+            if entry["agent"] not in agent_names:
+                agent_names.append(entry["agent"])
+
+    return {
+        "name": room_name or "Replayed Room",
+        "session_duration_minutes": 15,
+        "agents": [
+            {
+                "name": name,
+                "system_prompt": f"You are {name}.",
+                "voice": DEFAULT_VOICES[idx % len(DEFAULT_VOICES)]
+            }
+            for idx, name in enumerate(agent_names)
+        ]
+    }
+
+
+# ============================================================================
+# DETERMINISTIC STUB PROVIDERS
+# ============================================================================
+
+def _sized_text(length):
+    """Filler text of exactly `length` characters"""
+    text = " ".join(FILLER_WORDS)
+    while len(text) < length:
+        text = f"{text} {text}"
+    return text[:max(1, length)]
+
+
+class ReplayLLM:
+    """Returns responses with the recorded sizes, in recorded order"""
+
+    def __init__(self, base_ms=0, ms_per_char=0):
+        self.base_ms = base_ms
+        self.ms_per_char = ms_per_char
+        self.pending = []
+
+    def queue_turn(self, agent_entries):
+        self.pending = [entry["length"] for entry in agent_entries]
+
+    def chat(self, messages, cancel_event=None, model=None, max_tokens=None, usage=None):
+        length = self.pending.pop(0) if self.pending else 200
+        _simulate(self.base_ms + self.ms_per_char * length)
+        if usage is not None:
+            # Rough 4 characters per token, enough to exercise budgets
+            prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+            usage.update({"prompt_tokens": prompt_tokens, "completion_tokens": length // 4,
+                          "total_tokens": prompt_tokens + length // 4})
+        return _sized_text(length)
+
+
+class ReplayTTS:
+    """Returns silent audio sized like real speech for the given text"""
+
+    def __init__(self, base_ms=0, ms_per_char=0):
+        self.base_ms = base_ms
+        self.ms_per_char = ms_per_char
+
+    def synthesize(self, text, voice, audio_format=DEFAULT_TTS_FORMAT):
+        return base64.b64encode(self.synthesize_bytes(text, voice, audio_format)).decode("utf-8")
+
+    def synthesize_bytes(self, text, voice, audio_format=DEFAULT_TTS_FORMAT):
+        _simulate(self.base_ms + self.ms_per_char * len(text))
+        return synthesize_audio(text, TTS_FORMATS[audio_format]["encoding"], TTS_FORMATS[audio_format])
+
+    def synthesize_stream(self, text, voice, audio_format=DEFAULT_TTS_FORMAT):
+        audio = self.synthesize_bytes(text, voice, audio_format)
+        for offset in range(0, len(audio), TTS_STREAM_CHUNK_BYTES):
+            yield audio[offset:offset + TTS_STREAM_CHUNK_BYTES]
+
+
+def _simulate(ms):
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+
+def _serializing_emit(event, payload):
+    # Pay the serialization cost a real Socket.IO emit would
+    json.dumps(payload)
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+def replay_sessions(sessions, rooms, llm, tts):
+    samples = {stage: [] for stage in STAGES}
+    recorded_turn_ms = []
+    replayed_turns = 0
+
+    for doc in sessions:
+        turns = build_trace(doc)
+        if not turns:
+            continue
+
+        room = resolve_room(doc.get("room_name"), turns, rooms)
+        session = SessionManager(room, room.get("session_duration_minutes", 15))
+
+        for turn in turns:
+            # Keep the agent count in step with what was recorded
+            session.room = dict(room, agents=room["agents"][:len(turn["agents"])])
+            llm.queue_turn(turn["agents"])
+
+            session.log_interaction("user", turn["user_text"])
+            session.process_agents_streaming(turn["user_text"], llm, tts, _serializing_emit)
+
+            timings = session.last_turn_timings
+            replayed_turns += 1
+            if timings.get("cached"):
+                continue  # Answer-cache hits never reach the stub providers
+            for agent_timing in timings["agents"]:
+                for stage in ("llm_ms", "tts_ms", "emit_ms"):
+                    samples[stage].append(agent_timing[stage])
+            samples["turn_ms"].append(timings["total_ms"])
+            if turn["recorded_ms"] is not None:
+                recorded_turn_ms.append(turn["recorded_ms"])
+
+    return {
+        "sessions": len(sessions),
+        "turns": replayed_turns,
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "recorded_turn_ms": summarize(recorded_turn_ms)
+    }
+
+
+def compare_to_baseline(result, baseline, tolerance, floor_ms):
+    """Return a list of regressions where p50/p95 grew beyond tolerance"""
+    regressions = []
+    for stage in STAGES:
+        current = result["stages"].get(stage, {})
+        previous = baseline.get("stages", {}).get(stage, {})
+        if not current.get("count") or not previous.get("count"):
+            continue
+
+        for pct in ("p50", "p95"):
+            limit = previous[pct] * (1 + tolerance) + floor_ms
+            if current[pct] > limit:
+                regressions.append(
+                    f"{stage} {pct}: {current[pct]:.2f}ms > {limit:.2f}ms "
+                    f"(baseline {previous[pct]:.2f}ms)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded AURA sessions")
+    parser.add_argument("--source", help="JSON/NDJSON export to read instead of MongoDB")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--room", help="Only replay sessions from this room")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--llm-base-ms", type=float, default=0)
+    parser.add_argument("--llm-ms-per-char", type=float, default=0)
+    parser.add_argument("--tts-base-ms", type=float, default=0)
+    parser.add_argument("--tts-ms-per-char", type=float, default=0)
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p50/p95 growth")
+    parser.add_argument("--floor-ms", type=float, default=2.0, help="Absolute slack per comparison")
+    args = parser.parse_args()
+
+    if args.source:
+        sessions = load_sessions_from_file(args.source)
+    else:
+        sessions = load_sessions_from_mongo(args.mongo_uri, MONGO_DB_NAME, args.limit, args.room)
+    if args.room:
+        sessions = [s for s in sessions if s.get("room_name") == args.room]
+    sessions = sessions[:args.limit]
+
+    with open(ROOMS_CONFIG_PATH, "r", encoding="utf-8") as f:
+        rooms = json.load(f)["rooms"]
+
+    llm = ReplayLLM(args.llm_base_ms, args.llm_ms_per_char)
+    tts = ReplayTTS(args.tts_base_ms, args.tts_ms_per_char)
+
+    print(f"🔁 Replaying {len(sessions)} recorded sessions...")
+    result = replay_sessions(sessions, rooms, llm, tts)
+
+    print("\n" + "=" * 60)
+    print(f"📊 Replay: {result['sessions']} sessions, {result['turns']} turns")
+    print("=" * 60)
+    for stage in STAGES:
+        print(format_summary(stage, result["stages"][stage]))
+    print(format_summary("recorded turn (production)", result["recorded_turn_ms"]))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n💾 Baseline saved: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(result, baseline, args.tolerance, args.floor_ms)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+AURA Benchmark Reporting
+Percentile math and plain-text summaries shared by the benchmark tools
+"""
+
+import math
+
+
+def percentile(values, pct):
+    """
+    Linear-interpolated percentile of a list of numbers (pct in 0-100)
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+
+    rank = (pct / 100.0) * (len(ordered) - 1)
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values):
+    """Return count/mean/p50/p95/p99/max for a list of latencies"""
+    if not values:
+        return {"count": 0}
+
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values)
+    }
+
+
+def format_summary(label, summary, unit="ms"):
+    """Render one summary line for console output"""
+    if not summary.get("count"):
+        return f"{label:<28} (no samples)"
+
+    return (
+        f"{label:<28} n={summary['count']:<5} "
+        f"p50={summary['p50']:.0f}{unit}  "
+        f"p95={summary['p95']:.0f}{unit}  "
+        f"p99={summary['p99']:.0f}{unit}  "
+        f"max={summary['max']:.0f}{unit}"
+    )
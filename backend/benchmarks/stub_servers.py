@@ -0,0 +1,426 @@
+"""
+AURA Benchmark Stand-in Servers
+Local fake Cerebras (chat completions) and Deepgram (listen/speak) endpoints
+with configurable latency, jitter and error rates
+"""
+
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+FILLER_WORDS = (
+    "we should weigh the data against the bigger vision and test the idea "
+    "with a small pilot before committing the whole budget to it"
+).split()
+
+# Approximate encoded bytes per second of speech for each TTS encoding
+ENCODING_BYTES_PER_SECOND = {
+    "linear16": 32000,
+    "mulaw": 8000,
+    "alaw": 8000,
+    "opus": 4000,
+    "mp3": 6000,
+    "flac": 16000,
+    "aac": 6000
+}
+
+SPEECH_WORDS_PER_SECOND = 2.5
+
+
+# ============================================================================
+# FAULT PROFILE
+# ============================================================================
+
+class FaultProfile:
+    """Latency, jitter and failure settings for a stand-in server"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0,
+                 rate_limit_rate=0.0, seed=None, slow_rate=0.0, slow_ms=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Sleep for the configured latency plus uniform jitter and slow-tail outliers"""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            if self._random.random() < self.slow_rate:
+                jitter += self.slow_ms
+        seconds = max(0.0, self.latency_ms + jitter) / 1000.0
+        if seconds:
+            time.sleep(seconds)
+
+    def pick_failure(self):
+        """Return an HTTP status to fail with, or None to succeed"""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+
+# ============================================================================
+# BASE REQUEST HANDLER
+# ============================================================================
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Shared helpers for the stand-in request handlers"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_one_request(self):
+        # The server under test drops connections (cancelled streams,
+        # shutdown); that's expected and shouldn't bury the report
+        try:
+            super().handle_one_request()
+        except (ConnectionResetError, BrokenPipeError):
+            self.close_connection = True
+
+    @property
+    def stub(self):
+        return self.server.stub
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_failure(self, status):
+        self.stub.record("failures")
+        headers = {"Retry-After": "1"} if status == 429 else None
+        self._send_json(status, {"error": f"stand-in failure {status}"}, headers)
+
+    def _start_chunked(self, status, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+# ============================================================================
+# FAKE CEREBRAS (OpenAI-compatible chat completions)
+# ============================================================================
+
+class _LLMHandler(_StubHandler):
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": "not found"})
+
+        payload = json.loads(self._read_body() or b"{}")
+        self.stub.record("requests")
+
+        failure = self.stub.faults.pick_failure()
+        self.stub.faults.delay()
+        if failure:
+            return self._send_failure(failure)
+
+        words = self.stub.reply_words(payload)
+        prompt_tokens = sum(
+            len(str(m.get("content", "")).split()) for m in payload.get("messages", [])
+        )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words)
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = payload.get("model", "stub-model")
+
+        if payload.get("stream"):
+            self._stream_completion(completion_id, model, words, usage)
+        else:
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+
+    def _stream_completion(self, completion_id, model, words, usage):
+        self._start_chunked(200, "text/event-stream")
+        try:
+            for idx, word in enumerate(words):
+                delta = {"content": word if idx == 0 else f" {word}"}
+                if idx == 0:
+                    delta["role"] = "assistant"
+                self._write_event({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+                })
+                if self.stub.token_interval_ms:
+                    time.sleep(self.stub.token_interval_ms / 1000.0)
+
+            self._write_event({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._end_chunked()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream (e.g. a hedged request lost the race)
+            self.stub.record("cancelled")
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+
+# ============================================================================
+# FAKE DEEPGRAM (prerecorded listen + speak)
+# ============================================================================
+
+class _DeepgramHandler(_StubHandler):
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        body = self._read_body()
+
+        if parsed.path.rstrip("/").endswith("/v1/listen"):
+            return self._listen(body)
+        if parsed.path.rstrip("/").endswith("/v1/speak"):
+            return self._speak(body, params)
+        return self._send_json(404, {"error": "not found"})
+
+    def _listen(self, audio_bytes):
+        self.stub.record("listen_requests")
+
+        failure = self.stub.faults.pick_failure()
+        self.stub.faults.delay()
+        if failure:
+            return self._send_failure(failure)
+
+        transcript = self.stub.transcript
+        self._send_json(200, {
+            "metadata": {
+                "transaction_key": "deprecated",
+                "request_id": str(uuid.uuid4()),
+                "sha256": "",
+                "created": formatdate(usegmt=True),
+                "duration": len(audio_bytes) / 32000.0,
+                "channels": 1,
+                "models": ["stub-nova-2"]
+            },
+            "results": {
+                "channels": [{
+                    "alternatives": [{
+                        "transcript": transcript,
+                        "confidence": 0.99,
+                        "words": []
+                    }]
+                }]
+            }
+        })
+
+    def _speak(self, body, params):
+        self.stub.record("speak_requests")
+
+        failure = self.stub.faults.pick_failure()
+        self.stub.faults.delay()
+        if failure:
+            return self._send_failure(failure)
+
+        text = json.loads(body or b"{}").get("text", "")
+        encoding = params.get("encoding", "linear16")
+        audio = self.stub.synthesize(text, encoding, params)
+        content_type = {
+            "linear16": "audio/wav" if params.get("container") == "wav" else "audio/l16",
+            "opus": "audio/ogg",
+            "mp3": "audio/mpeg"
+        }.get(encoding, "application/octet-stream")
+
+        self._start_chunked(200, content_type, {
+            "dg-request-id": str(uuid.uuid4()),
+            "dg-model-uuid": str(uuid.uuid4()),
+            "dg-model-name": params.get("model", "aura-asteria-en"),
+            "dg-char-count": str(len(text)),
+            "Date": formatdate(usegmt=True)
+        })
+        try:
+            chunk_size = self.stub.audio_chunk_bytes
+            for offset in range(0, len(audio), chunk_size):
+                self._write_chunk(audio[offset:offset + chunk_size])
+                if self.stub.audio_chunk_interval_ms:
+                    time.sleep(self.stub.audio_chunk_interval_ms / 1000.0)
+            self._end_chunked()
+        except (BrokenPipeError, ConnectionResetError):
+            self.stub.record("cancelled")
+
+
+# ============================================================================
+# STAND-IN SERVER WRAPPER
+# ============================================================================
+
+class StubServer:
+    """Runs one stand-in HTTP server on a background thread"""
+
+    def __init__(self, handler_class, port=0, host="127.0.0.1", faults=None,
+                 reply_words=40, token_interval_ms=0, transcript=None,
+                 audio_chunk_bytes=4096, audio_chunk_interval_ms=0):
+        self.faults = faults or FaultProfile()
+        self.default_reply_words = reply_words
+        self.token_interval_ms = token_interval_ms
+        self.transcript = transcript or "What should our strategy be for next quarter?"
+        self.audio_chunk_bytes = audio_chunk_bytes
+        self.audio_chunk_interval_ms = audio_chunk_interval_ms
+
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer((host, port), handler_class)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, counter):
+        with self._stats_lock:
+            self.stats[counter] = self.stats.get(counter, 0) + 1
+
+    def reply_words(self, payload):
+        """Deterministic filler reply, capped by the request's max_tokens"""
+        count = self.default_reply_words
+        max_tokens = payload.get("max_tokens")
+        if max_tokens:
+            count = min(count, int(max_tokens))
+        return [FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(max(1, count))]
+
+    def synthesize(self, text, encoding, params):
+        return synthesize_audio(text, encoding, params)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def synthesize_audio(text, encoding="linear16", params=None):
+    """Return silent audio sized like real speech for the given text"""
+    params = params or {}
+    seconds = max(0.5, len(text.split()) / SPEECH_WORDS_PER_SECOND)
+
+    if encoding == "linear16":
+        sample_rate = int(params.get("sample_rate", 16000))
+        pcm = b"\x00\x00" * int(sample_rate * seconds)
+        if params.get("container", "wav") == "wav":
+            return _wav_header(len(pcm), sample_rate) + pcm
+        return pcm
+
+    size = int(ENCODING_BYTES_PER_SECOND.get(encoding, 8000) * seconds)
+    return bytes(size)
+
+
+def _wav_header(data_length, sample_rate, channels=1, sample_width=2):
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_length, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate,
+        channels * sample_width, sample_width * 8,
+        b"data", data_length
+    )
+
+
+def start_llm_server(port=0, **kwargs):
+    """Start a fake Cerebras chat-completions server"""
+    return StubServer(_LLMHandler, port=port, **kwargs).start()
+
+
+def start_deepgram_server(port=0, **kwargs):
+    """Start a fake Deepgram listen/speak server"""
+    return StubServer(_DeepgramHandler, port=port, **kwargs).start()
+
+
+# ============================================================================
+# STANDALONE ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Run AURA stand-in provider servers")
+    parser.add_argument("--llm-port", type=int, default=8101)
+    parser.add_argument("--deepgram-port", type=int, default=8102)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--token-interval-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    faults = dict(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate
+    )
+    llm = start_llm_server(args.llm_port, faults=FaultProfile(**faults),
+                           token_interval_ms=args.token_interval_ms)
+    deepgram = start_deepgram_server(args.deepgram_port, faults=FaultProfile(**faults))
+
+    print(f"🧪 Fake Cerebras: CEREBRAS_BASE_URL={llm.url}/v1/chat/completions")
+    print(f"🧪 Fake Deepgram: DEEPGRAM_BASE_URL={deepgram.url}")
+    print("Press Ctrl+C to stop")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        llm.stop()
+        deepgram.stop()
+
+
+if __name__ == "__main__":
+    main()
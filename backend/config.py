@@ -20,10 +20,36 @@ FLASK_SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'aura-secret-key-change-in-prod
 # AUDIO SETTINGS
 # ============================================================================
 
+DEEPGRAM_BASE_URL = os.getenv("DEEPGRAM_BASE_URL", "")  # Empty = Deepgram cloud
 SAMPLE_RATE = 16000
 AUDIO_FORMAT = "linear16"
 AUDIO_CONTAINER = "wav"
 
+# TTS output formats, negotiated per session from what the client can play.
+# Deepgram fixes the sample rate for opus (48 kHz) and mp3 (22.05 kHz).
+TTS_FORMATS = {
+    "opus": {"encoding": "opus", "container": "ogg", "mime_type": "audio/ogg"},
+    "mp3": {"encoding": "mp3", "mime_type": "audio/mpeg"},
+    "wav": {
+        "encoding": AUDIO_FORMAT,
+        "container": AUDIO_CONTAINER,
+        "sample_rate": SAMPLE_RATE,
+        "mime_type": "audio/wav"
+    }
+}
+TTS_FORMAT_PREFERENCE = ["opus", "mp3", "wav"]  # Smallest first
+DEFAULT_TTS_FORMAT = "wav"  # For clients that don't advertise formats
+TTS_STREAM_CHUNK_BYTES = 4096  # Audio bytes per agent_audio_chunk event
+TTS_REQUEST_TIMEOUT = 30       # Seconds (connect / between streamed chunks)
+
+# Synthesized clips served from /api/audio/<clip_id> when the client asks
+# for audio_delivery="url"
+AUDIO_STORE_BACKEND = os.getenv("AUDIO_STORE_BACKEND", "disk")  # "disk" or "memory"
+AUDIO_STORE_DIR = "audio_cache"
+AUDIO_STORE_MAX_BYTES = int(os.getenv("AUDIO_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+AUDIO_STORE_MAX_KEYS = 10000          # Remembered text+voice -> clip lookups
+AUDIO_CACHE_MAX_AGE = 7 * 24 * 3600   # Seconds; clip URLs are content-addressed
+
 # ============================================================================
 # DEFAULT VOICES (Deepgram Aura)
 # ============================================================================
@@ -39,17 +65,111 @@ DEFAULT_VOICES = [
 # ============================================================================
 
 CEREBRAS_MODEL = "llama-3.3-70b"
-CEREBRAS_BASE_URL = "https://api.cerebras.ai/v1/chat/completions"
-MAX_TOKENS = 200
-MIN_REQUEST_INTERVAL = 1.0  # Seconds between API calls
+CEREBRAS_BASE_URL = os.getenv("CEREBRAS_BASE_URL", "https://api.cerebras.ai/v1/chat/completions")
+MAX_TOKENS = 200  # Default when a rooms.json agent doesn't set max_tokens
+CEREBRAS_FAST_MODEL = os.getenv("CEREBRAS_FAST_MODEL", "llama3.1-8b")  # Used when a turn runs behind budget
+BUDGET_DOWNGRADE_ENABLED = os.getenv("BUDGET_DOWNGRADE_ENABLED", "0") == "1"  # Opt-in
+MIN_REQUEST_INTERVAL = float(os.getenv("MIN_REQUEST_INTERVAL", "1.0"))  # Seconds between API calls
 MAX_RETRIES = 3
+LLM_REQUEST_TIMEOUT = 30  # Seconds (connect / between streamed chunks)
+LLM_MAX_WORKERS = 32      # Threads shared by primary and hedged requests
+
+# Primary endpoint first; any others are used for hedging and failover.
+# "models" maps the model names rooms.json and budget downgrades ask for to
+# the name this endpoint serves them under; None serves any name as given.
+# Names missing from the map fall back to the endpoint's own "model".
+# CEREBRAS_SECONDARY_MODELS="llama3.1-8b,big-model=other-name"
+CEREBRAS_ENDPOINTS = [
+    {"name": "cerebras-primary", "url": CEREBRAS_BASE_URL, "model": CEREBRAS_MODEL, "models": None}
+]
+if os.getenv("CEREBRAS_SECONDARY_URL") or os.getenv("CEREBRAS_SECONDARY_MODEL"):
+    CEREBRAS_ENDPOINTS.append({
+        "name": "cerebras-secondary",
+        "url": os.getenv("CEREBRAS_SECONDARY_URL", CEREBRAS_BASE_URL),
+        "model": os.getenv("CEREBRAS_SECONDARY_MODEL", CEREBRAS_MODEL),
+        "models": {
+            requested.strip(): (served or requested).strip()
+            for requested, _, served in (
+                pair.partition("=") for pair in os.getenv("CEREBRAS_SECONDARY_MODELS", "").split(",") if pair.strip()
+            )
+        }
+    })
+
+# ============================================================================
+# PROVIDER RESILIENCE (all providers)
+# ============================================================================
+
+RETRY_BASE_DELAY = 0.5           # Seconds - first backoff step before jitter
+RETRY_MAX_DELAY = 8.0            # Seconds - longer Retry-After values fail fast
+CIRCUIT_FAILURE_THRESHOLD = 5    # Consecutive failures before a circuit opens
+CIRCUIT_RESET_TIMEOUT = 30       # Seconds an open circuit waits before probing
+
+# ============================================================================
+# LLM HEDGING (tail-latency control)
+# ============================================================================
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+HEDGE_PERCENTILE = 95      # Hedge when first token is slower than this percentile
+HEDGE_MIN_DELAY = 0.3      # Seconds - never hedge sooner than this
+HEDGE_MAX_DELAY = 5.0      # Seconds - always hedge by this point
+HEDGE_INITIAL_DELAY = 2.0  # Seconds - used until enough samples are observed
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200         # First-token samples kept for the percentile
+
+# ============================================================================
+# SERVER SETTINGS
+# ============================================================================
+
+SERVER_HOST = os.getenv("AURA_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("AURA_PORT", "5000"))
+DEBUG = os.getenv("AURA_DEBUG", "1") == "1"
+STARTUP_TIME_BUDGET = float(os.getenv("STARTUP_TIME_BUDGET", "3.0"))  # Seconds until /ready
+
+# ============================================================================
+# AUTHENTICATION
+# ============================================================================
+
+BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", "12"))  # Cost factor for new hashes
+BCRYPT_POOL_SIZE = int(os.getenv("BCRYPT_POOL_SIZE", "2"))     # Hashing processes
+BCRYPT_MAX_PENDING = 32    # Hashes queued or running before auth answers 503
+BCRYPT_TIMEOUT = 10        # Seconds to wait for a hash
+JWT_EXPIRY_DAYS = 7
+JWT_CACHE_SIZE = 10000     # Decoded tokens kept in memory
+JWT_CACHE_TTL = 300        # Seconds a decoded token is trusted without re-checking
+REQUIRE_AUTH = os.getenv("REQUIRE_AUTH", "0") == "1"  # Reject sockets/API calls without a token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # X-Admin-Token for /api/admin/*; empty disables them
+
+# ============================================================================
+# ADMISSION CONTROL
+# ============================================================================
+
+MAX_CONCURRENT_TURNS = int(os.getenv("MAX_CONCURRENT_TURNS", "16"))  # Turns talking to providers at once
+MAX_QUEUED_TURNS = int(os.getenv("MAX_QUEUED_TURNS", "32"))          # Turns waiting before we shed load
+ADMISSION_TIMEOUT = 30          # Seconds a queued turn waits before giving up
+SERVER_BUSY_RETRY_AFTER = 5     # Seconds clients are told to back off when rejected
 
 # ============================================================================
 # SESSION SETTINGS
 # ============================================================================
 
 ALLOWED_DURATIONS = [5, 15]  # Minutes
+MAX_ROOM_AGENTS = 5           # Per client-defined room
+MAX_AGENT_PROMPT_CHARS = 4000
+ROOM_CACHE_SIZE = 256         # Custom rooms kept prepared in memory
 MAX_CONTEXT_MESSAGES = 6  # Keep last N messages in context
+MAX_CONTEXT_CHARS = 4000      # Per context message; longer combined replies are clipped
+CONVERSATION_LOG_SIZE = 50    # Entries kept in memory per session (MongoDB has the full log)
+RESUME_GRACE_PERIOD = 60      # Seconds a disconnected session waits for its client to resume
+EVENT_BUFFER_SIZE = 2000      # Unacknowledged events kept per session for replay on resume
+# ...and at most this many bytes of them; audio chunks dominate, so this is
+# what bounds a session's memory while its client is away or slow to ack
+EVENT_BUFFER_MAX_BYTES = int(os.getenv("EVENT_BUFFER_MAX_BYTES", str(2 * 1024 * 1024)))
+TURN_HANDOFF_TIMEOUT = 2.0   # Seconds a new turn waits for an interrupted one to wind down
+CANCEL_POLL_INTERVAL = 0.1   # Seconds between cancellation checks while waiting on providers
+# LLM tokens a session may use before its context is cut back (0 = unlimited);
+# a room's "token_budget" in rooms.json overrides this
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+BUDGET_CONTEXT_MESSAGES = 2  # Context kept once a session is over its token budget
 
 # ============================================================================
 # FILE PATHS
@@ -57,14 +177,88 @@ MAX_CONTEXT_MESSAGES = 6  # Keep last N messages in context
 
 ROOMS_CONFIG_PATH = "rooms.json"
 LOGS_DIR = "logs"
+PROFILES_DIR = "profiles"
+ARCHIVE_DIR = os.path.join(LOGS_DIR, "archive")
 
 # ============================================================================
-# MONGODB (for future use)
+# PROFILING
+# ============================================================================
+
+# Turns are only profiled when asked to: every Nth turn, sessions that opt
+# in, or the next few turns armed through /api/admin/profiling
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")  # "cprofile" (.pstats) or "sampling" (.collapsed)
+PROFILE_EVERY_N_TURNS = int(os.getenv("PROFILE_EVERY_N_TURNS", "0"))  # 0 = off
+PROFILE_SESSION_OPT_IN = os.getenv("PROFILE_SESSION_OPT_IN", "0") == "1"  # Honour start_session {profile: true}
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+PROFILES_MAX_FILES = 200         # Oldest profiles are deleted beyond this
+
+# ============================================================================
+# MONGODB
 # ============================================================================
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 MONGO_DB_NAME = 'aura_database' # <-- ADD THIS LINE
 
+# Connection pool, shared by every request and socket thread
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_MS = 60000             # Idle pooled connections closed after this
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 2000    # Wait for a free pooled connection before failing
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+MONGO_CONNECT_TIMEOUT_MS = 3000
+MONGO_SOCKET_TIMEOUT_MS = 10000       # Per operation on an open connection
+# "majority" survives a primary failover; 1 is faster for chat logs
+MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "1")
+MONGO_SLOW_QUERY_MS = int(os.getenv("MONGO_SLOW_QUERY_MS", "100"))  # Commands logged when slower
+
+# ============================================================================
+# ANSWER CACHE
+# ============================================================================
+
+# Rooms opt in with "answer_cache": true; only opening questions are cached
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))  # Seconds
+ANSWER_CACHE_MAX_ENTRIES = 500   # Per room, least recently used evicted
+ANSWER_CACHE_SIMILARITY = 0.8    # Estimated Jaccard needed for a near-duplicate hit
+ANSWER_CACHE_SHINGLE_SIZE = 4    # Characters per shingle
+ANSWER_CACHE_BANDS = 16          # LSH bands x rows = MinHash signature length
+ANSWER_CACHE_ROWS = 4
+
+# ============================================================================
+# ARCHIVE
+# ============================================================================
+
+# Completed sessions older than this move from MongoDB to ARCHIVE_DIR
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "0") == "1"
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_INTERVAL = 6 * 3600   # Seconds between background archive runs
+ARCHIVE_BATCH_SIZE = 500      # Sessions moved per batch
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+EXPORT_BATCH_SIZE = 200          # Sessions per MongoDB cursor batch (?batch_size=)
+EXPORT_MAX_BATCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024   # NDJSON buffered into chunks of about this size
+
+# ============================================================================
+# SEARCH
+# ============================================================================
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_MAX_RESULTS = 1000     # Deepest result reachable by paging (skip stays cheap)
+SEARCH_SNIPPET_CHARS = 160
+
+# ============================================================================
+# ANALYTICS
+# ============================================================================
+
+ANALYTICS_COLLECTION = "session_rollups"  # One document per room per day
+LATENCY_BUCKETS_MS = [250, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 13000, 20000, 30000]
+ANALYTICS_DEFAULT_DAYS = 7
+ANALYTICS_MAX_DAYS = 366
+
 # ============================================================================
 # VALIDATION
 # ============================================================================
@@ -1,91 +1,204 @@
 """
 AURA Database Module
-MongoDB integration for session storage (for future use)
-All code is commented out - uncomment when ready to use MongoDB
+MongoDB connection with an explicitly sized pool, write concern and
+timeouts. Every command is timed into /api/metrics and slow ones are
+logged. Collections are read and written through repositories.py.
 """
 
-from pymongo import MongoClient
-from config import MONGO_URI, MONGO_DB_NAME
+import threading
+
+from pymongo import MongoClient, monitoring
+from pymongo.errors import DuplicateKeyError
+
+import metrics
+from config import (
+    MONGO_URI, MONGO_DB_NAME, ANALYTICS_COLLECTION,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WRITE_CONCERN, MONGO_SLOW_QUERY_MS
+)
 
 # Global MongoDB client and database
 mongo_client = None
 db = None
 
 
+def get_db():
+    """Current database handle (None until initialize_mongodb succeeds)"""
+    return db
+
+
+# ============================================================================
+# INSTRUMENTATION
+# ============================================================================
+
+class CommandTimer(monitoring.CommandListener):
+    """Per-command counts and latency in metrics; slow commands are logged"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.collections = {}  # request id -> collection the command targets
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            with self.lock:
+                self.collections[(event.request_id, event.connection_id)] = target
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed):
+        with self.lock:
+            collection = self.collections.pop((event.request_id, event.connection_id), None)
+        ms = event.duration_micros / 1000
+        name = event.command_name
+        metrics.incr("mongo_commands", command=name)
+        metrics.incr("mongo_command_ms", ms, command=name)
+        if failed:
+            metrics.incr("mongo_command_failures", command=name)
+            print(f"❌ MongoDB {name} on {collection or event.database_name} failed: {event.failure}")
+        elif ms >= MONGO_SLOW_QUERY_MS:
+            metrics.incr("mongo_slow_commands", command=name)
+            print(f"🐢 Slow MongoDB {name} on {collection or event.database_name}: {ms:.0f}ms")
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connections in use and failed check-outs (pool exhausted, timeouts)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_use = 0
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.in_use += 1
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.in_use -= 1
+
+    def connection_check_out_failed(self, event):
+        metrics.incr("mongo_checkout_failures", reason=str(event.reason))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        metrics.incr("mongo_pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+
+command_timer = CommandTimer()
+pool_monitor = PoolMonitor()
+
+
+def client_options():
+    """MongoClient settings: pool, timeouts, write concern and listeners"""
+    write_concern = MONGO_WRITE_CONCERN
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "w": int(write_concern) if write_concern.isdigit() else write_concern,
+        "retryWrites": True,
+        "appname": "aura",
+        "event_listeners": [command_timer, pool_monitor]
+    }
+
+
+def pool_stats():
+    """Connection pool settings and current use, for /api/metrics"""
+    with pool_monitor.lock:
+        in_use = pool_monitor.in_use
+    return {
+        "connected": db is not None,
+        "in_use": in_use,
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "write_concern": MONGO_WRITE_CONCERN
+    }
+
+
+# ============================================================================
+# CONNECTION
+# ============================================================================
+
 def initialize_mongodb():
     """Initialize MongoDB connection"""
     global mongo_client, db
-    
+
     try:
-        mongo_client = MongoClient(MONGO_URI)
+        mongo_client = MongoClient(MONGO_URI, **client_options())
         db = mongo_client[MONGO_DB_NAME]
-        
+
         # Test connection
         db.command('ping')
-        
-        # Create indexes for better performance
-        db.sessions.create_index("start_time")
-        db.sessions.create_index("status")
-        
-        print("✅ MongoDB connected successfully")
-        return True
-        
+
     except Exception as e:
         print(f"⚠️ MongoDB connection failed: {e}")
         print("   Falling back to file-based logging")
+        db = None
         return False
 
+    print("✅ MongoDB connected successfully")
+    create_indexes(db)
+    return True
 
-def save_session_to_db(session_data):
+
+def create_indexes(database):
     """
-    Save complete session to MongoDB
-    
-    Args:
-        session_data: Dict containing session info
+    Create indexes for better performance. Each is built on its own, so one
+    that can't be built (e.g. over existing duplicates) is reported without
+    dropping the connection. Returns the names of the ones that failed.
     """
-    if db is not None:
-        try:
-            result = db.sessions.insert_one(session_data)
-            print(f"💾 Session saved to MongoDB: {result.inserted_id}")
-            return result.inserted_id
-        except Exception as e:
-            print(f"❌ MongoDB save error: {e}")
-            return None
-    return None
-
-
-def get_session_by_id(session_id):
-    """Get session from MongoDB by ID"""
-    if db is not None:
-        try:
-            return db.sessions.find_one({"_id": session_id})
-        except Exception as e:
-            print(f"❌ MongoDB query error: {e}")
-            return None
-    return None
-
-
-def get_recent_sessions(limit=10):
-    """Get recent sessions"""
-    if db is not None:
+    indexes = [
+        (database.sessions, "start_time", {}),
+        (database.sessions, "status", {}),
+        (database.sessions, [("room_name", 1), ("start_time", 1)], {}),  # Filtered exports
+        (database.users, "email", {"unique": True}),
+        (database[ANALYTICS_COLLECTION], [("room", 1), ("day", 1)], {"unique": True}),
+        (database[ANALYTICS_COLLECTION], "day", {}),
+        (database.messages, [("content", "text")], {"name": "content_text"}),
+        (database.messages, "session_id", {}),
+    ]
+    failed = []
+    for collection, keys, options in indexes:
         try:
-            return list(db.sessions.find().sort("start_time", -1).limit(limit))
+            collection.create_index(keys, **options)
+        except DuplicateKeyError as e:
+            failed.append(f"{collection.name}.{keys}")
+            if collection.name == "users":
+                print("❌ Can't enforce unique user emails: some accounts share an email address.")
+                print("   Merge or remove the duplicate users (group users by email to find them),")
+                print("   then restart to build the index. Signups can race to duplicates until then.")
+            else:
+                print(f"❌ Duplicate values block unique index {keys} on {collection.name}: {e}")
         except Exception as e:
-            print(f"❌ MongoDB query error: {e}")
-            return []
-    return []
+            failed.append(f"{collection.name}.{keys}")
+            print(f"⚠️ Could not create index {keys} on {collection.name}: {e}")
+    return failed
 
-
-def update_session_status(session_id, status):
-    """Update session status"""
-    if db is not None:
-        try:
-            db.sessions.update_one(
-                {"_id": session_id},
-                {"$set": {"status": status}}
-            )
-            return True
-        except Exception as e:
-            print(f"❌ MongoDB update error: {e}")
-            return False
-    return False
\ No newline at end of file
@@ -4,12 +4,16 @@ Audio processing, Speech-to-Text, Text-to-Speech, and LLM interactions
 """
 
 import os
+import json
 import base64
 import time
+import threading
 import subprocess
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import requests
-from deepgram import DeepgramClient # Reverted to the correct import for the older SDK
 from config import *
+from resilience import get_breaker, is_retryable, resilient_call, with_retries, CircuitOpenError
 
 
 # ============================================================================
@@ -71,6 +75,24 @@ class AudioHandler:
                 pass
 
 
+# ============================================================================
+# TTS FORMAT NEGOTIATION
+# ============================================================================
+
+def negotiate_audio_format(client_formats):
+    """
+    Pick the most compact TTS format the client says it can play
+    """
+    if not client_formats:
+        return DEFAULT_TTS_FORMAT
+    
+    accepted = {str(fmt).lower() for fmt in client_formats}
+    for fmt in TTS_FORMAT_PREFERENCE:
+        if fmt in accepted:
+            return fmt
+    return DEFAULT_TTS_FORMAT
+
+
 # ============================================================================
 # DEEPGRAM HANDLER (Reverted to be compatible with deepgram-sdk==3.5.0)
 # ============================================================================
@@ -79,7 +101,16 @@ class DeepgramHandler:
     """Handles Deepgram API for STT and TTS"""
     
     def __init__(self, api_key):
-        self.client = DeepgramClient(api_key)
+        # Imported here: the SDK is slow to import and only needed once warm
+        from deepgram import DeepgramClient, DeepgramClientOptions
+        
+        self.api_key = api_key
+        self.speak_url = f"{(DEEPGRAM_BASE_URL or 'https://api.deepgram.com').rstrip('/')}/v1/speak"
+        if DEEPGRAM_BASE_URL:
+            # Point the SDK at a self-hosted or stand-in endpoint
+            self.client = DeepgramClient(api_key, DeepgramClientOptions(url=DEEPGRAM_BASE_URL))
+        else:
+            self.client = DeepgramClient(api_key)
     
     def transcribe(self, audio_file):
         """
@@ -98,8 +129,11 @@ class DeepgramHandler:
                 "language": "en"
             }
 
-            response = self.client.listen.prerecorded.v("1").transcribe_file(
-                {'buffer': buffer}, options
+            response = resilient_call(
+                lambda: self.client.listen.prerecorded.v("1").transcribe_file(
+                    {'buffer': buffer}, options
+                ),
+                "deepgram-listen"
             )
             
             # Accessing the response as a dictionary
@@ -115,33 +149,144 @@ class DeepgramHandler:
             print(f"❌ Transcription error: {e}")
             return None
     
-    def synthesize(self, text, voice):
+    def synthesize(self, text, voice, audio_format=DEFAULT_TTS_FORMAT):
+        """
+        Convert text to speech in one of the TTS_FORMATS, base64-encoded
+        """
+        audio_data = self.synthesize_bytes(text, voice, audio_format)
+        if audio_data is None:
+            return None
+        return base64.b64encode(audio_data).decode("utf-8")
+    
+    def synthesize_bytes(self, text, voice, audio_format=DEFAULT_TTS_FORMAT):
         """
-        Convert text to speech
+        Convert text to speech in one of the TTS_FORMATS, as raw bytes
         """
         try:
-            print(f"🔊 Synthesizing with {voice}: '{text[:50]}...'")
+            print(f"🔊 Synthesizing with {voice} ({audio_format}): '{text[:50]}...'")
             
-            options = {
-                "model": voice,
-                "encoding": AUDIO_FORMAT,
-                "container": AUDIO_CONTAINER,
-                "sample_rate": SAMPLE_RATE
-            }
+            options = {"model": voice}
+            options.update({
+                key: value for key, value in TTS_FORMATS[audio_format].items()
+                if key != "mime_type"
+            })
             
-            response = self.client.speak.v("1").stream(
-                {"text": text}, options
+            response = resilient_call(
+                lambda: self.client.speak.v("1").stream({"text": text}, options),
+                "deepgram-speak"
             )
             
             # --- FIX IS HERE: Changed response.get('stream') to response.stream ---
             audio_data = response.stream.read()
             
             print(f"✅ TTS generated: {len(audio_data)} bytes")
-            return base64.b64encode(audio_data).decode("utf-8")
+            return audio_data
             
         except Exception as e:
             print(f"❌ TTS error for voice '{voice}': {e}")
             return None
+    
+    def synthesize_stream(self, text, voice, audio_format=DEFAULT_TTS_FORMAT):
+        """
+        Convert text to speech, yielding raw audio bytes as they arrive
+        """
+        print(f"🔊 Streaming TTS with {voice} ({audio_format}): '{text[:50]}...'")
+        
+        params = {"model": voice}
+        params.update({
+            key: value for key, value in TTS_FORMATS[audio_format].items()
+            if key != "mime_type"
+        })
+        
+        # The SDK buffers whole clips, so the speak endpoint is called directly
+        response = resilient_call(lambda: self._open_speak_stream(text, params), "deepgram-speak")
+        with response:
+            total = 0
+            for chunk in response.iter_content(chunk_size=TTS_STREAM_CHUNK_BYTES):
+                if chunk:
+                    total += len(chunk)
+                    yield chunk
+        print(f"✅ TTS streamed: {total} bytes")
+    
+    def _open_speak_stream(self, text, params):
+        response = requests.post(
+            self.speak_url,
+            params=params,
+            json={"text": text},
+            headers={"Authorization": f"Token {self.api_key}"},
+            timeout=TTS_REQUEST_TIMEOUT,
+            stream=True
+        )
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        return response
+
+
+# ============================================================================
+# LLM HEDGING HELPERS
+# ============================================================================
+
+class LatencyTracker:
+    """Rolling window of time-to-first-token samples used to pick the hedge delay"""
+    
+    def __init__(self, window=HEDGE_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+    
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+    
+    def percentile(self, pct):
+        with self.lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def hedge_delay(self):
+        """Seconds to wait for a first token before firing a hedge"""
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_INITIAL_DELAY
+        return min(max(self.percentile(HEDGE_PERCENTILE), HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+
+class _Race:
+    """Shared state between the primary and hedged attempts of one LLM call"""
+    
+    def __init__(self, cancel_event=None):
+        self.lock = threading.Lock()
+        self.winner = None
+        self.errors = {}  # attempt_id -> exception it failed with
+        self.changed = threading.Event()
+        self.cancel_event = cancel_event  # Set when the user barges in
+    
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+    
+    def claim(self, attempt_id):
+        """First attempt to produce a token wins; returns False for the loser"""
+        with self.lock:
+            if self.winner is None and not self.cancelled():
+                self.winner = attempt_id
+            self.changed.set()
+            return self.winner == attempt_id
+    
+    def lost(self, attempt_id):
+        if self.cancelled():
+            return True
+        return self.winner is not None and self.winner != attempt_id
+    
+    def failed(self, attempt_id, error):
+        with self.lock:
+            self.errors[attempt_id] = error
+        self.changed.set()
+    
+    def error(self, attempt_id):
+        with self.lock:
+            return self.errors.get(attempt_id)
 
 
 # ============================================================================
@@ -149,77 +294,267 @@ class DeepgramHandler:
 # ============================================================================
 
 class CerebrasHandler:
-    """Handles Cerebras LLM API with rate limiting"""
+    """Handles Cerebras LLM API with rate limiting and hedged requests"""
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, endpoints=None):
         self.api_key = api_key
+        self.endpoints = endpoints or CEREBRAS_ENDPOINTS
         self.last_request_time = 0
+        self.latency = LatencyTracker()
+        self.executor = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, thread_name_prefix="llm")
     
-    def chat(self, messages):
+    def chat(self, messages, cancel_event=None, model=None, max_tokens=None, usage=None):
         """
-        Get LLM response with automatic retry
+        Get LLM response with jittered backoff and circuit breaking.
+        model/max_tokens override the endpoint's model and MAX_TOKENS.
+        If `usage` is a dict it is filled with the completion's token counts.
+        Returns None early once cancel_event is set.
         """
-        for attempt in range(MAX_RETRIES):
-            try:
-                elapsed = time.time() - self.last_request_time
-                if elapsed < MIN_REQUEST_INTERVAL:
+        options = {"model": model, "max_tokens": max_tokens or MAX_TOKENS}
+        try:
+            elapsed = time.time() - self.last_request_time
+            if elapsed < MIN_REQUEST_INTERVAL:
+                if cancel_event is not None:
+                    if cancel_event.wait(MIN_REQUEST_INTERVAL - elapsed):
+                        return None
+                else:
                     time.sleep(MIN_REQUEST_INTERVAL - elapsed)
+            
+            self.last_request_time = time.time()
+            result = with_retries(lambda: self._hedged_completion(messages, options, cancel_event), "cerebras",
+                                  cancel_event=cancel_event)
+            if result is None:
+                print("🛑 LLM request cancelled")
+                return None
+            
+            text, completion_usage = result
+            if usage is not None and completion_usage:
+                usage.update(completion_usage)
+            
+            print(f"✅ LLM response: {text[:50]}...")
+            return text
+            
+        except CircuitOpenError as e:
+            print(f"🚫 LLM unavailable: {e}")
+            return None
+        except Exception as e:
+            print(f"❌ LLM error: {e}")
+            return None
+    
+    def _hedged_completion(self, messages, options, cancel_event=None):
+        """
+        Send to the primary endpoint; if no first token arrives within the
+        hedge delay, race a duplicate against it on the next endpoint and
+        keep whichever streams first. If the primary fails with a retryable
+        error, fail over to a different endpoint whose circuit is closed;
+        otherwise the error goes back to with_retries and its backoff.
+        Returns None as soon as cancel_event is set.
+        """
+        race = _Race(cancel_event)
+        primary = self._next_endpoint(0)
+        if primary is None:
+            raise CircuitOpenError("cerebras")
+        futures = [self.executor.submit(self._stream_completion, self.endpoints[primary], messages, options, race, 0)]
+        
+        if HEDGE_ENABLED:
+            delay = self.latency.hedge_delay()
+            deadline = time.monotonic() + delay
+            while not race.changed.is_set() and not race.cancelled():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                race.changed.wait(min(remaining, CANCEL_POLL_INTERVAL))
+            
+            if race.winner is None and not race.cancelled():
+                # Decided from what woke us, not futures[0].done(): the primary
+                # reports failure before its future resolves
+                primary_error = race.error(0)
+                if primary_error is not None:
+                    failover = self._failover_endpoint(primary, primary_error)
+                    if failover is not None:
+                        endpoint = self.endpoints[failover]
+                        print(f"⤴️ Failing over LLM request to {endpoint['name']} (primary failed)")
+                        futures.append(self.executor.submit(
+                            self._stream_completion, endpoint, messages, options, race, 1))
+                else:
+                    # Only the latency trigger may duplicate onto the primary's
+                    # own endpoint (when it is the only one admitting requests)
+                    hedge = self._next_endpoint(primary + 1)
+                    if hedge is not None:
+                        endpoint = self.endpoints[hedge]
+                        target = "same endpoint" if hedge == primary else endpoint['name']
+                        print(f"⏩ Hedging LLM request to {target} (no first token after {delay:.2f}s)")
+                        futures.append(self.executor.submit(
+                            self._stream_completion, endpoint, messages, options, race, 1))
+        
+        error = None
+        pending = set(futures)
+        while pending:
+            # Attempts stuck before their first byte notice cancellation
+            # late, so stop waiting on them rather than on the network
+            done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if result is not None:
+                    return result
+            if race.cancelled():
+                return None
+        
+        if race.cancelled():
+            return None
+        raise error or RuntimeError("All LLM attempts were cancelled")
+    
+    def _next_endpoint(self, start):
+        """
+        Index of the first endpoint from `start` (wrapping) whose circuit
+        admits a request, or None if every circuit is open
+        """
+        for offset in range(len(self.endpoints)):
+            index = (start + offset) % len(self.endpoints)
+            if get_breaker(self.endpoints[index]["name"]).allow():
+                return index
+        return None
+    
+    def _failover_endpoint(self, primary, error):
+        """
+        A different endpoint with a closed circuit to retry a failed primary
+        on at once, or None: non-retryable errors are never re-sent, and
+        retrying the same endpoint is left to with_retries and its backoff
+        """
+        if error is None or not is_retryable(error):
+            return None
+        for offset in range(1, len(self.endpoints)):
+            index = (primary + offset) % len(self.endpoints)
+            breaker = get_breaker(self.endpoints[index]["name"])
+            if breaker.state == breaker.CLOSED and breaker.allow():
+                return index
+        return None
+    
+    @staticmethod
+    def _endpoint_model(endpoint, requested):
+        """
+        The name to send `endpoint` for a per-agent or downgraded model: its
+        own model when none was requested or it doesn't serve that one
+        """
+        if not requested:
+            return endpoint["model"]
+        models = endpoint.get("models")
+        if models is None:
+            return requested
+        return models.get(requested, endpoint["model"])
+    
+    def _stream_completion(self, endpoint, messages, options, race, attempt_id):
+        """
+        Stream one completion as (text, usage); returns None if another
+        attempt won the race
+        """
+        breaker = get_breaker(endpoint["name"])
+        try:
+            result = self._stream_completion_unguarded(endpoint, messages, options, race, attempt_id)
+        except Exception as e:
+            race.failed(attempt_id, e)
+            if is_retryable(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+    
+    def _stream_completion_unguarded(self, endpoint, messages, options, race, attempt_id):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": self._endpoint_model(endpoint, options["model"]),
+            "messages": messages,
+            "max_tokens": options["max_tokens"],
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+        
+        started = time.perf_counter()
+        response = requests.post(
+            endpoint["url"],
+            json=payload,
+            headers=headers,
+            timeout=LLM_REQUEST_TIMEOUT,
+            stream=True
+        )
+        with response:
+            response.raise_for_status()
+            
+            parts = []
+            usage = None
+            for raw_line in response.iter_lines():
+                # Closing the response cancels the loser's stream
+                if race.lost(attempt_id):
+                    return None
                 
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                payload = {
-                    "model": CEREBRAS_MODEL,
-                    "messages": messages,
-                    "max_tokens": MAX_TOKENS
-                }
-                
-                self.last_request_time = time.time()
-                response = requests.post(
-                    CEREBRAS_BASE_URL,
-                    json=payload,
-                    headers=headers,
-                    timeout=30
-                )
-                response.raise_for_status()
+                line = raw_line.decode("utf-8")
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
                 
-                result = response.json()['choices'][0]['message']['content']
-                print(f"✅ LLM response: {result[:50]}...")
-                return result
+                chunk = json.loads(data)
+                # Token counts arrive once, on the final chunk
+                usage = chunk.get("usage") or usage
+                choices = chunk.get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if not delta:
+                    continue
                 
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    wait_time = (attempt + 1) * 2
-                    print(f"⚠️ Rate limited. Waiting {wait_time}s (retry {attempt + 1}/{MAX_RETRIES})")
-                    time.sleep(wait_time)
-                else:
-                    print(f"❌ LLM HTTP error: {e}")
-                    if attempt == MAX_RETRIES - 1:
+                if not parts:
+                    self.latency.record(time.perf_counter() - started)
+                    if not race.claim(attempt_id):
                         return None
-            except Exception as e:
-                print(f"❌ LLM error: {e}")
-                if attempt == MAX_RETRIES - 1:
-                    return None
-        
-        return None
+                parts.append(delta)
+            
+            if race.lost(attempt_id):
+                return None
+            return "".join(parts), usage
 
 
 # ============================================================================
-# INITIALIZE GLOBAL HANDLERS
+# SHARED HANDLERS (created lazily, reused by every session)
 # ============================================================================
 
+_deepgram_client = None
+_cerebras_handler = None
+_handlers_lock = threading.Lock()
+
+
+def get_deepgram_client():
+    """Shared DeepgramHandler, created on first use"""
+    global _deepgram_client
+    if _deepgram_client is None:
+        with _handlers_lock:
+            if _deepgram_client is None:
+                _deepgram_client = DeepgramHandler(DEEPGRAM_API_KEY)
+    return _deepgram_client
+
+
+def get_cerebras_handler():
+    """Shared CerebrasHandler, created on first use"""
+    global _cerebras_handler
+    if _cerebras_handler is None:
+        with _handlers_lock:
+            if _cerebras_handler is None:
+                _cerebras_handler = CerebrasHandler(CEREBRAS_API_KEY)
+    return _cerebras_handler
+
+
 def initialize_handlers():
-    """Initialize all handlers"""
-    global deepgram_client, cerebras_handler
-    
-    deepgram_client = DeepgramHandler(DEEPGRAM_API_KEY)
-    cerebras_handler = CerebrasHandler(CEREBRAS_API_KEY)
+    """Create all handlers up front (called once during warm-up)"""
+    get_deepgram_client()
+    get_cerebras_handler()
     
     print("✅ All handlers initialized")
-
-# Initialize handlers when module is imported
-deepgram_client = None
-cerebras_handler = None
-initialize_handlers()
\ No newline at end of file
@@ -3,22 +3,35 @@ AURA - Multi-Agent Voice Assistant MVP
 Main application entry point
 """
 
+import io
 import os
 import json
 import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
-import sounddevice as sd
 import numpy as np
-from deepgram import DeepgramClient, PrerecordedOptions, SpeakOptions
+from deepgram import DeepgramClient, DeepgramClientOptions, PrerecordedOptions
 import requests
 import wave
-import tempfile
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # No PortAudio: batch mode still works
+    sd = None
 
 # Load environment variables
 load_dotenv()
 
+DEEPGRAM_BASE_URL = os.getenv("DEEPGRAM_BASE_URL", "")  # Empty = Deepgram cloud
+TTS_SAMPLE_RATE = 24000       # Raw PCM from Deepgram, played as it arrives
+TTS_CHUNK_BYTES = 4096
+DEFAULT_VOICE = "aura-asteria-en"
+
 class ConfigLoader:
     """Load and manage rooms configuration"""
     
@@ -50,6 +63,11 @@ class ConfigLoader:
                 print("Please enter a number.")
 
 
+def _require_sounddevice():
+    if sd is None:
+        raise RuntimeError("sounddevice/PortAudio is not available; use --batch for headless runs")
+
+
 class AudioHandler:
     """Handle voice input/output"""
     
@@ -60,6 +78,7 @@ class AudioHandler:
     
     def record_audio(self):
         """Record audio while user holds Enter key"""
+        _require_sounddevice()
         print("\n🎤 Press and HOLD Enter to speak, release when done...")
         input()  # Wait for Enter press
         
@@ -86,34 +105,79 @@ class AudioHandler:
             return audio_data
         return None
     
-    def save_wav(self, audio_data, filename):
-        """Save audio data as WAV file"""
-        with wave.open(filename, 'wb') as wf:
+    def to_wav_bytes(self, audio_data):
+        """Wrap recorded samples in an in-memory WAV container"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wf:
             wf.setnchannels(1)
             wf.setsampwidth(2)  # 16-bit
             wf.setframerate(self.sample_rate)
             wf.writeframes(audio_data.tobytes())
+        return buffer.getvalue()
+
+
+class Speaker:
+    """
+    Speaks agent replies in order on a background thread, writing TTS audio
+    to the sound card as it streams in so agent 1 talks while the others think
+    """
     
-    def play_audio(self, audio_file):
-        """Play audio file"""
-        with wave.open(audio_file, 'rb') as wf:
-            audio_data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
-            sd.play(audio_data, wf.getframerate())
-            sd.wait()
+    def __init__(self, deepgram, sample_rate=TTS_SAMPLE_RATE):
+        _require_sounddevice()
+        self.deepgram = deepgram
+        self.sample_rate = sample_rate
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def say(self, text, voice=DEFAULT_VOICE):
+        self.queue.put((text, voice))
+    
+    def wait(self):
+        """Block until everything queued has been spoken"""
+        self.queue.join()
+    
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+    
+    def _run(self):
+        with sd.RawOutputStream(samplerate=self.sample_rate, channels=1, dtype='int16') as stream:
+            while True:
+                item = self.queue.get()
+                try:
+                    if item is None:
+                        return
+                    self._play(stream, *item)
+                except Exception as e:
+                    print(f"❌ Playback error: {e}")
+                finally:
+                    self.queue.task_done()
+    
+    def _play(self, stream, text, voice):
+        leftover = b""
+        for chunk in self.deepgram.synthesize_stream(text, voice, self.sample_rate):
+            # The stream only takes whole 16-bit frames
+            data = leftover + chunk
+            usable = len(data) - len(data) % 2
+            stream.write(data[:usable])
+            leftover = data[usable:]
 
 
 class DeepgramHandler:
     """Handle Deepgram STT and TTS"""
     
     def __init__(self, api_key):
-        self.client = DeepgramClient(api_key)
+        self.api_key = api_key
+        if DEEPGRAM_BASE_URL:
+            self.client = DeepgramClient(api_key, DeepgramClientOptions(url=DEEPGRAM_BASE_URL))
+        else:
+            self.client = DeepgramClient(api_key)
+        self.speak_url = f"{DEEPGRAM_BASE_URL or 'https://api.deepgram.com'}/v1/speak"
     
-    def transcribe(self, audio_file):
-        """Convert speech to text"""
+    def transcribe(self, wav_bytes):
+        """Convert in-memory WAV audio to text"""
         try:
-            with open(audio_file, 'rb') as f:
-                buffer = f.read()
-            
             options = PrerecordedOptions(
                 model="nova-2",
                 smart_format=True,
@@ -121,7 +185,7 @@ class DeepgramHandler:
             )
             
             response = self.client.listen.prerecorded.v('1').transcribe_file(
-                {'buffer': buffer}, options
+                {'buffer': wav_bytes}, options
             )
             
             transcript = response['results']['channels'][0]['alternatives'][0]['transcript']
@@ -131,25 +195,31 @@ class DeepgramHandler:
             print(f"❌ Transcription error: {e}")
             return None
     
-    def synthesize(self, text, voice="aura-2-asteria-en", output_file="output.wav"):
-        """Convert text to speech"""
+    def synthesize_stream(self, text, voice=DEFAULT_VOICE, sample_rate=TTS_SAMPLE_RATE):
+        """Convert text to speech, yielding raw 16-bit PCM as it arrives"""
+        params = {
+            "model": voice,
+            "encoding": "linear16",
+            "sample_rate": sample_rate,
+            "container": "none"
+        }
         try:
-            options = SpeakOptions(
-                model="aura-asteria-en"
-            )
-            
-            # Override with specific voice
-            response = self.client.speak.v('1').save(
-                output_file,
-                {'text': text},
-                options
+            response = requests.post(
+                self.speak_url,
+                params=params,
+                json={"text": text},
+                headers={"Authorization": f"Token {self.api_key}"},
+                timeout=30,
+                stream=True
             )
-            
-            return output_file
+            with response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=TTS_CHUNK_BYTES):
+                    if chunk:
+                        yield chunk
         
         except Exception as e:
             print(f"❌ TTS error: {e}")
-            return None
 
 
 class CerebrasHandler:
@@ -157,12 +227,16 @@ class CerebrasHandler:
     
     def __init__(self, api_key):
         self.api_key = api_key
-        self.base_url = "https://api.cerebras.ai/v1/chat/completions"
+        self.base_url = os.getenv("CEREBRAS_BASE_URL", "https://api.cerebras.ai/v1/chat/completions")
         self.model = "llama3.3-70b"
         self.max_tokens = 65000
     
     def chat(self, messages, temperature=0.7, max_tokens=500):
         """Make LLM API call"""
+        return self.chat_with_usage(messages, temperature, max_tokens)[0]
+    
+    def chat_with_usage(self, messages, temperature=0.7, max_tokens=500):
+        """Make LLM API call, returning (text, usage) with token counts"""
         try:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -179,11 +253,12 @@ class CerebrasHandler:
             response = requests.post(self.base_url, json=payload, headers=headers)
             response.raise_for_status()
             
-            return response.json()['choices'][0]['message']['content']
+            body = response.json()
+            return body['choices'][0]['message']['content'], body.get('usage', {})
         
         except Exception as e:
             print(f"❌ LLM error: {e}")
-            return None
+            return None, {}
 
 
 class SessionManager:
@@ -237,20 +312,28 @@ class SessionManager:
 class MultiAgentSystem:
     """Orchestrate multi-agent conversation flow"""
     
-    def __init__(self, agents, llm_handler):
+    def __init__(self, agents, llm_handler, verbose=True):
         self.agents = agents
         self.llm = llm_handler
         self.context = []
+        self.verbose = verbose
+        self.last_agent_stats = []  # Latency and token usage per agent, latest turn
     
-    def process_user_input(self, user_text):
-        """Pass user input through all agents sequentially"""
-        print("\n🤖 Agents processing your input...\n")
+    def process_user_input(self, user_text, on_response=None):
+        """
+        Pass user input through all agents sequentially. on_response(agent, text)
+        is called as soon as each agent answers.
+        """
+        if self.verbose:
+            print("\n🤖 Agents processing your input...\n")
         
         agent_responses = []
+        self.last_agent_stats = []
         current_context = user_text
         
         for idx, agent in enumerate(self.agents, 1):
-            print(f"   Agent {idx} ({agent['name']}) thinking...")
+            if self.verbose:
+                print(f"   Agent {idx} ({agent['name']}) thinking...")
             
             # Build messages for this agent
             messages = [
@@ -271,13 +354,27 @@ class MultiAgentSystem:
                 messages.append({"role": "user", "content": current_context})
             
             # Get agent response
-            response = self.llm.chat(messages, temperature=agent['temperature'], max_tokens=200)
+            started = time.perf_counter()
+            response, usage = self.llm.chat_with_usage(
+                messages, temperature=agent.get('temperature', 0.7), max_tokens=200
+            )
+            self.last_agent_stats.append({
+                "agent": agent['name'],
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                "prompt_tokens": usage.get('prompt_tokens'),
+                "completion_tokens": usage.get('completion_tokens'),
+                "ok": bool(response)
+            })
             
             if response:
                 agent_responses.append(response)
-                print(f"   ✓ Agent {idx} responded\n")
+                if self.verbose:
+                    print(f"   ✓ Agent {idx} responded\n")
             else:
                 agent_responses.append("I need a moment to think about that.")
+            
+            if on_response:
+                on_response(agent, agent_responses[-1])
         
         # Combine all agent responses
         final_response = self._combine_responses(agent_responses)
@@ -300,13 +397,156 @@ class MultiAgentSystem:
         return combined
 
 
+class BatchEvaluator:
+    """Run prompts from a JSONL file through a room's agents without audio"""
+    
+    def __init__(self, room, llm_handler, concurrency=4):
+        self.room = room
+        self.llm = llm_handler
+        self.concurrency = concurrency
+        self.write_lock = threading.Lock()
+    
+    @staticmethod
+    def load_conversations(path):
+        """
+        Each line is {"id": ..., "prompt": "..."} or, for multi-turn
+        conversations, {"id": ..., "turns": ["...", "..."]}
+        """
+        conversations = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                turns = item.get('turns') or [item.get('prompt') or item.get('text')]
+                # A bare string would otherwise be run one character per turn
+                if not isinstance(turns, list) or not all(isinstance(t, str) and t.strip() for t in turns):
+                    raise ValueError(f"Line {line_no}: expected a 'prompt' string or a 'turns' list of strings")
+                conversations.append({"id": item.get('id', line_no), "turns": turns})
+        return conversations
+    
+    def run_conversation(self, conversation):
+        """
+        All turns of one conversation, sharing context like a live session.
+        A turn that raises ends the conversation with an error record; the
+        turns before it are kept.
+        """
+        system = MultiAgentSystem(self.room['agents'], self.llm, verbose=False)
+        results = []
+        for turn_idx, prompt in enumerate(conversation['turns']):
+            started = time.perf_counter()
+            try:
+                _, agent_responses = system.process_user_input(prompt)
+            except Exception as e:
+                results.append(self._error_record(conversation, e, turn_idx, prompt))
+                break
+            results.append({
+                "id": conversation['id'],
+                "turn": turn_idx,
+                "room": self.room['name'],
+                "prompt": prompt,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                "agents": [
+                    dict(stats, response=text)
+                    for stats, text in zip(system.last_agent_stats, agent_responses)
+                ]
+            })
+        return results
+    
+    def _error_record(self, conversation, error, turn_idx=None, prompt=None):
+        return {
+            "id": conversation['id'],
+            "turn": turn_idx,
+            "room": self.room['name'],
+            "prompt": prompt,
+            "error": f"{type(error).__name__}: {error}"
+        }
+    
+    def run(self, conversations, output_path):
+        """Run conversations concurrently, appending results to output_path as they finish"""
+        done_turns = 0
+        failed_agents = 0
+        failed_conversations = 0
+        started = time.perf_counter()
+        
+        with open(output_path, 'w', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self.run_conversation, c): c for c in conversations}
+            for future in as_completed(futures):
+                conversation = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [self._error_record(conversation, e)]
+                with self.write_lock:
+                    for result in results:
+                        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                        if 'error' in result:
+                            failed_conversations += 1
+                            continue
+                        done_turns += 1
+                        failed_agents += sum(1 for a in result['agents'] if not a['ok'])
+                    out.flush()
+                if results and 'error' in results[-1]:
+                    print(f"   ✗ Conversation {conversation['id']} failed: {results[-1]['error']}")
+                else:
+                    print(f"   ✓ Conversation {conversation['id']} done ({done_turns} turns written)")
+        
+        elapsed = time.perf_counter() - started
+        print(f"\n✅ Batch finished: {len(conversations)} conversations, {done_turns} turns "
+              f"in {elapsed:.1f}s ({failed_agents} failed agent calls, "
+              f"{failed_conversations} failed conversations)")
+        print(f"💾 Results saved: {output_path}")
+
+
+def select_room_by_arg(rooms, room_arg):
+    """Room by 1-based index or (case-insensitive) name"""
+    if room_arg.isdigit():
+        return rooms['rooms'][int(room_arg) - 1]
+    for room in rooms['rooms']:
+        if room['name'].lower() == room_arg.lower():
+            return room
+    raise ValueError(f"Unknown room: {room_arg}")
+
+
+def run_batch(args, cerebras_key):
+    """Headless evaluation: prompts in, per-agent latencies and tokens out"""
+    if not cerebras_key:
+        print("❌ Error: CEREBRAS_API_KEY not found in .env file")
+        return
+    
+    rooms = ConfigLoader.load_rooms(args.rooms)
+    room = select_room_by_arg(rooms, args.room) if args.room else rooms['rooms'][0]
+    conversations = BatchEvaluator.load_conversations(args.batch)
+    output = args.output or f"batch_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    
+    print(f"🧪 Batch mode: {len(conversations)} conversations through '{room['name']}' "
+          f"({args.concurrency} at a time)")
+    BatchEvaluator(room, CerebrasHandler(cerebras_key), args.concurrency).run(conversations, output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AURA CLI voice assistant")
+    parser.add_argument("--batch", help="JSONL prompts to evaluate headlessly (no audio)")
+    parser.add_argument("--room", help="Room name or 1-based index (batch mode)")
+    parser.add_argument("--rooms", default="rooms.json", help="Rooms configuration file")
+    parser.add_argument("--concurrency", type=int, default=4, help="Conversations run at once (batch mode)")
+    parser.add_argument("--output", help="JSONL results file (batch mode)")
+    return parser.parse_args()
+
+
 def main():
     """Main application loop"""
+    args = parse_args()
     
     # Check for API keys
     deepgram_key = os.getenv("DEEPGRAM_API_KEY")
     cerebras_key = os.getenv("CEREBRAS_API_KEY")
     
+    if args.batch:
+        run_batch(args, cerebras_key)
+        return
+    
     if not deepgram_key or not cerebras_key:
         print("❌ Error: API keys not found in .env file")
         print("Please create a .env file with:")
@@ -348,7 +588,7 @@ def main():
     session.log_interaction("assistant", greeting)
     
     # Main conversation loop
-    temp_dir = tempfile.mkdtemp()
+    speaker = Speaker(deepgram)
     
     try:
         while not session.is_expired():
@@ -363,12 +603,9 @@ def main():
                 print("⚠️  No audio recorded. Please try again.")
                 continue
             
-            # Save and transcribe
-            audio_file = os.path.join(temp_dir, "user_input.wav")
-            audio_handler.save_wav(audio_data, audio_file)
-            
+            # Transcribe straight from memory
             print("🔄 Transcribing...")
-            user_text = deepgram.transcribe(audio_file)
+            user_text = deepgram.transcribe(audio_handler.to_wav_bytes(audio_data))
             
             if not user_text:
                 print("⚠️  Could not understand. Please try again.")
@@ -384,17 +621,17 @@ def main():
                 session.log_interaction("assistant", farewell)
                 break
             
-            # Process through agents
-            response, agent_responses = multi_agent.process_user_input(user_text)
+            # Process through agents; each one starts speaking as soon as it answers
+            response, agent_responses = multi_agent.process_user_input(
+                user_text,
+                on_response=lambda agent, text: speaker.say(text, agent.get('voice') or DEFAULT_VOICE)
+            )
             
             print(f"\n🤖 AURA: {response}\n")
             session.log_interaction("assistant", response)
             
-            # Synthesize and play response
             print("🔊 Speaking...")
-            tts_file = os.path.join(temp_dir, "response.wav")
-            if deepgram.synthesize(response, output_file=tts_file):
-                audio_handler.play_audio(tts_file)
+            speaker.wait()
             
             print("\n" + "-"*60 + "\n")
         
@@ -405,13 +642,11 @@ def main():
         print("\n\n👋 Session interrupted by user.")
     
     finally:
+        speaker.close()
+        
         # Save session log
         session.save_log()
         print("\n✅ AURA session ended. Goodbye!\n")
-        
-        # Cleanup temp files
-        import shutil
-        shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+"""
+AURA Metrics
+Thread-safe in-process counters, exposed at /api/metrics
+"""
+
+import threading
+
+
+_lock = threading.Lock()
+_counters = {}
+
+
+def _label_key(labels):
+    if not labels:
+        return "total"
+    return ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+
+
+def incr(name, value=1, **labels):
+    """Add `value` to counter `name` for the given labels"""
+    key = _label_key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def get(name, **labels):
+    """Current value of one counter series"""
+    with _lock:
+        return _counters.get(name, {}).get(_label_key(labels), 0)
+
+
+def snapshot():
+    """Copy of all counters as {name: {labels: value}}"""
+    with _lock:
+        return {name: dict(series) for name, series in _counters.items()}
@@ -0,0 +1,194 @@
+"""
+AURA Profiling
+Opt-in profiles of single turns, written to PROFILES_DIR as .pstats files
+(cProfile) or collapsed stacks (sampling) for flamegraph tools
+"""
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from config import (
+    PROFILE_MODE, PROFILE_EVERY_N_TURNS, PROFILE_SAMPLE_INTERVAL,
+    PROFILES_DIR, PROFILES_MAX_FILES
+)
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+# Only one cProfile can be active per interpreter on Python 3.12+; turns
+# that find it taken are sampled instead
+_cprofile_slot = threading.Lock()
+
+
+# ============================================================================
+# PROFILES
+# ============================================================================
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread"""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def write(self, path):
+        """Collapsed-stack format: one "frame;frame;... count" line per stack"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class TurnProfile:
+    """A running profile of one turn; stop() writes it out"""
+
+    def __init__(self, mode, label):
+        self.label = label
+        self.started = time.perf_counter()
+        self.profiler = None
+        self.sampler = None
+        if mode == "cprofile" and _cprofile_slot.acquire(blocking=False):
+            try:
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+            except ValueError:
+                # Another profiling tool owns the interpreter hook
+                self.profiler = None
+                _cprofile_slot.release()
+        if self.profiler is None:
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+
+    def stop(self):
+        """Finish profiling and return the written file's path"""
+        if self.profiler is not None:
+            self.profiler.disable()
+            _cprofile_slot.release()
+        else:
+            self.sampler.stop()
+
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        extension = "pstats" if self.profiler is not None else "collapsed"
+        path = os.path.join(PROFILES_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{self.label}.{extension}")
+        try:
+            if self.profiler is not None:
+                self.profiler.dump_stats(path)
+            else:
+                self.sampler.write(path)
+        except OSError as e:
+            print(f"❌ Could not write profile: {e}")
+            return None
+
+        elapsed = time.perf_counter() - self.started
+        print(f"🔬 Profiled {self.label} ({elapsed:.2f}s) -> {path}")
+        _prune_profiles()
+        return path
+
+
+def _prune_profiles():
+    entries = sorted(
+        (e for e in os.scandir(PROFILES_DIR) if e.is_file()),
+        key=lambda e: e.stat().st_mtime
+    )
+    for entry in entries[:max(0, len(entries) - PROFILES_MAX_FILES)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            continue
+
+
+def list_profiles():
+    """Written profiles, newest first"""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    entries = sorted(
+        (e for e in os.scandir(PROFILES_DIR) if e.is_file()),
+        key=lambda e: e.stat().st_mtime,
+        reverse=True
+    )
+    return [{"name": e.name, "bytes": e.stat().st_size} for e in entries]
+
+
+# ============================================================================
+# TRIGGERS
+# ============================================================================
+
+class TurnProfiler:
+    """
+    Decides which turns get profiled. When nothing is armed, start_turn()
+    is a couple of attribute reads and returns None.
+    """
+
+    def __init__(self, mode=PROFILE_MODE, every_n_turns=PROFILE_EVERY_N_TURNS):
+        self.mode = mode
+        self.every_n_turns = every_n_turns
+        self.armed_turns = 0  # Next N turns on any session, set by an admin
+        self.lock = threading.Lock()
+
+    def configure(self, mode=None, every_n_turns=None, next_turns=None):
+        """Change triggers at runtime; raises ValueError on bad settings"""
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+        with self.lock:
+            if mode is not None:
+                self.mode = mode
+            if every_n_turns is not None:
+                self.every_n_turns = max(0, int(every_n_turns))
+            if next_turns is not None:
+                self.armed_turns = max(0, int(next_turns))
+        return self.status()
+
+    def status(self):
+        return {
+            "mode": self.mode,
+            "every_n_turns": self.every_n_turns,
+            "armed_turns": self.armed_turns
+        }
+
+    def start_turn(self, session, turn_id):
+        """A TurnProfile if this turn should be profiled, else None"""
+        if not self._wants(session, turn_id):
+            return None
+        label = f"{session.session_id or session.resume_token[:8]}-turn{turn_id}"
+        return TurnProfile(self.mode, label)
+
+    def _wants(self, session, turn_id):
+        if session.profile:
+            return True
+        if self.every_n_turns and turn_id % self.every_n_turns == 0:
+            return True
+        if self.armed_turns:
+            with self.lock:
+                if self.armed_turns:
+                    self.armed_turns -= 1
+                    return True
+        return False
+
+
+# Shared by every socket connection
+profiler = TurnProfiler()
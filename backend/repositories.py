@@ -0,0 +1,246 @@
+"""
+AURA Repositories
+The only code that knows how sessions, messages, users, rollups, custom
+rooms and the archive index are stored.
+Handles are looked up per call, so nothing holds a stale connection, and
+failures raise instead of being printed and swallowed; callers decide
+whether a missing write matters.
+"""
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from config import ANALYTICS_COLLECTION
+from database import get_db
+
+
+class DatabaseUnavailableError(Exception):
+    """Raised when MongoDB is not connected"""
+
+
+def _object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+class _Repository:
+    collection_name = None
+
+    @property
+    def collection(self):
+        db = get_db()
+        if db is None:
+            raise DatabaseUnavailableError("Database not connected")
+        return db[self.collection_name]
+
+
+# ============================================================================
+# SESSIONS
+# ============================================================================
+
+class SessionRepository(_Repository):
+    collection_name = "sessions"
+
+    def create(self, room_name, start_time):
+        """New active session; returns its id"""
+        result = self.collection.insert_one({
+            "room_name": room_name,
+            "start_time": start_time,
+            "status": "active",
+            "conversation": [],
+            "messages_indexed": True  # Searchable as it is logged
+        })
+        return result.inserted_id
+
+    def append_message(self, session_id, entry):
+        self.collection.update_one({"_id": session_id}, {"$push": {"conversation": entry}})
+
+    def finalize(self, session_id, end_time, duration_seconds, token_usage):
+        self.collection.update_one(
+            {"_id": session_id},
+            {"$set": {
+                "end_time": end_time,
+                "status": "completed",
+                "duration_seconds": duration_seconds,
+                "token_usage": token_usage
+            }}
+        )
+
+    def get(self, session_id):
+        """Full session document, or None (also for malformed ids)"""
+        object_id = _object_id(session_id)
+        if object_id is None:
+            return None
+        return self.collection.find_one({"_id": object_id})
+
+    def recent_completed(self, limit=50):
+        """Newest completed sessions, without their conversations"""
+        return list(
+            self.collection.find({"status": "completed"}, {"conversation": 0})
+            .sort("start_time", -1)
+            .limit(limit)
+        )
+
+    def completed_cursor(self, room=None, since=None, until=None, batch_size=None):
+        """Completed sessions oldest first, fetched batch_size at a time"""
+        query = {"status": "completed"}
+        if room:
+            query["room_name"] = room
+        if since or until:
+            query["start_time"] = {}
+            if since:
+                query["start_time"]["$gte"] = since
+            if until:
+                query["start_time"]["$lt"] = until
+        return self.collection.find(query, batch_size=batch_size or 0).sort("start_time", 1)
+
+    def unindexed_cursor(self, batch_size=None):
+        """Sessions whose messages aren't in the search collection yet"""
+        return self.collection.find(
+            {"messages_indexed": {"$ne": True}},
+            {"room_name": 1, "conversation": 1},
+            batch_size=batch_size or 0
+        )
+
+    def mark_indexed(self, session_id):
+        self.collection.update_one({"_id": session_id}, {"$set": {"messages_indexed": True}})
+
+    def completed_before(self, cutoff, limit):
+        """Oldest completed sessions that started before cutoff"""
+        return list(
+            self.collection.find({"status": "completed", "start_time": {"$lt": cutoff}})
+            .sort("start_time", 1)
+            .limit(limit)
+        )
+
+    def delete_many(self, session_ids):
+        self.collection.delete_many({"_id": {"$in": list(session_ids)}})
+
+
+# ============================================================================
+# MESSAGES (search index)
+# ============================================================================
+
+class MessageRepository(_Repository):
+    collection_name = "messages"
+
+    def insert(self, doc):
+        self.collection.insert_one(doc)
+
+    def insert_many(self, docs):
+        self.collection.insert_many(docs, ordered=False)
+
+    def delete_for_sessions(self, session_ids):
+        self.collection.delete_many({"session_id": {"$in": list(session_ids)}})
+
+    def text_search(self, criteria, skip, limit):
+        """Matches for a $text query, best first, each with its textScore"""
+        return list(
+            self.collection.find(criteria, {"score": {"$meta": "textScore"}})
+            .sort([("score", {"$meta": "textScore"}), ("timestamp", -1)])
+            .skip(skip)
+            .limit(limit)
+        )
+
+
+# ============================================================================
+# ARCHIVE INDEX
+# ============================================================================
+
+class ArchivedSessionRepository(_Repository):
+    """Where each archived session's gzip member lives"""
+    collection_name = "archived_sessions"
+
+    def indexed_ids(self, session_ids):
+        """The subset of session_ids already recorded"""
+        return {
+            doc["_id"] for doc in
+            self.collection.find({"_id": {"$in": list(session_ids)}}, {"_id": 1})
+        }
+
+    def insert_many(self, entries):
+        self.collection.insert_many(entries, ordered=False)
+
+    def discard_from(self, path, offset):
+        """Forget entries at or past `offset` in one partition file"""
+        self.collection.delete_many({"path": path, "offset": {"$gte": offset}})
+
+    def get(self, session_id):
+        object_id = _object_id(session_id)
+        if object_id is None:
+            return None
+        return self.collection.find_one({"_id": object_id})
+
+
+# ============================================================================
+# ANALYTICS ROLLUPS
+# ============================================================================
+
+class RollupRepository(_Repository):
+    collection_name = ANALYTICS_COLLECTION
+
+    def add(self, room, day, increments, updated_at):
+        """$inc one room/day rollup, creating it if needed"""
+        self.collection.update_one(
+            {"room": room, "day": day},
+            {"$inc": increments, "$set": {"updated_at": updated_at}},
+            upsert=True
+        )
+
+    def since(self, day, room=None):
+        """Rollups from `day` (YYYY-MM-DD) on, oldest first"""
+        query = {"day": {"$gte": day}}
+        if room:
+            query["room"] = room
+        return list(self.collection.find(query, {"_id": 0}).sort("day", 1))
+
+
+# ============================================================================
+# CUSTOM ROOMS
+# ============================================================================
+
+class CustomRoomRepository(_Repository):
+    collection_name = "custom_rooms"
+
+    def get(self, room_id):
+        """Stored room definition, or None"""
+        doc = self.collection.find_one({"_id": room_id})
+        return doc["room"] if doc else None
+
+    def save(self, room_id, room, created_at):
+        """Store a definition once; later saves of the same id are no-ops"""
+        self.collection.update_one(
+            {"_id": room_id},
+            {"$setOnInsert": {"room": room, "created_at": created_at}},
+            upsert=True
+        )
+
+
+# ============================================================================
+# USERS
+# ============================================================================
+
+class UserRepository(_Repository):
+    collection_name = "users"
+
+    def find_by_email(self, email):
+        return self.collection.find_one({"email": email})
+
+    def email_taken(self, email):
+        return self.collection.find_one({"email": email}, {"_id": 1}) is not None
+
+    def insert(self, doc):
+        """New user's id; raises DuplicateKeyError if the email is taken"""
+        return self.collection.insert_one(doc).inserted_id
+
+
+sessions = SessionRepository()
+messages = MessageRepository()
+users = UserRepository()
+archived_sessions = ArchivedSessionRepository()
+rollups = RollupRepository()
+custom_rooms = CustomRoomRepository()
@@ -0,0 +1,226 @@
+"""
+AURA Provider Resilience
+Jittered exponential backoff, Retry-After handling and per-endpoint
+circuit breakers shared by the Cerebras and Deepgram handlers
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import metrics
+from config import (
+    MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+)
+
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, name):
+        super().__init__(f"Circuit open for {name}")
+        self.name = name
+
+
+# ============================================================================
+# ERROR CLASSIFICATION
+# ============================================================================
+
+def _error_chain(exc):
+    while exc is not None:
+        yield exc
+        exc = exc.__cause__
+
+
+def status_code_of(exc):
+    """HTTP status behind a requests/httpx/Deepgram error, if any"""
+    for err in _error_chain(exc):
+        response = getattr(err, "response", None)
+        if response is not None and getattr(response, "status_code", None):
+            return int(response.status_code)
+        status = getattr(err, "status", None)
+        if status is not None and str(status).isdigit():
+            return int(status)
+    return None
+
+
+def parse_retry_after(exc):
+    """Seconds requested by a Retry-After header on the error's response"""
+    for err in _error_chain(exc):
+        response = getattr(err, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers or not headers.get("Retry-After"):
+            continue
+
+        value = headers["Retry-After"].strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def is_retryable(exc):
+    """Transport failures, timeouts, 429 and 5xx are worth retrying"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = status_code_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    # requests errors are OSErrors; httpx (used by the Deepgram SDK) are not
+    return any(
+        isinstance(err, OSError) or type(err).__module__.split(".")[0] in ("httpx", "httpcore")
+        for err in _error_chain(exc)
+    )
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Full-jitter exponential backoff for the given 0-based attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures, fails fast while open, and lets a
+    single probe through once the reset timeout has elapsed
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                print(f"✅ Circuit closed for {self.name}")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.incr("circuit_opened", endpoint=self.name)
+                    print(f"🚫 Circuit opened for {self.name} after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, fn):
+        """Run fn through the breaker"""
+        if not self.allow():
+            metrics.incr("provider_short_circuits", endpoint=self.name)
+            raise CircuitOpenError(self.name)
+        try:
+            result = fn()
+        except Exception as e:
+            if is_retryable(e):
+                self.record_failure()
+            else:
+                # Client errors say nothing about provider health
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Shared circuit breaker for one provider endpoint"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def circuit_states():
+    """{endpoint: state} for every breaker created so far"""
+    with _breakers_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
+
+
+# ============================================================================
+# RETRY
+# ============================================================================
+
+def with_retries(fn, name, max_attempts=MAX_RETRIES, cancel_event=None):
+    """
+    Call fn, retrying retryable failures with jittered exponential backoff.
+    A Retry-After longer than RETRY_MAX_DELAY fails fast rather than
+    parking the calling thread. Returns None if cancel_event is set while
+    backing off.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            metrics.incr("provider_failures", endpoint=name)
+            if not is_retryable(e) or attempt == max_attempts - 1:
+                raise
+
+            delay = parse_retry_after(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            elif delay > RETRY_MAX_DELAY:
+                print(f"⚠️ {name} asked to retry after {delay:.0f}s; giving up")
+                raise
+
+            metrics.incr("provider_retries", endpoint=name)
+            print(f"⚠️ {name} failed ({e}). Retrying in {delay:.2f}s ({attempt + 1}/{max_attempts - 1})")
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    return None
+            else:
+                time.sleep(delay)
+
+
+def resilient_call(fn, name, max_attempts=MAX_RETRIES):
+    """Retries around a circuit-breaker-guarded call to one endpoint"""
+    breaker = get_breaker(name)
+    return with_retries(lambda: breaker.call(fn), name, max_attempts)
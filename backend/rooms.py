@@ -0,0 +1,179 @@
+"""
+AURA Room Registry
+Built-in rooms (rooms.json) and saved custom rooms, looked up by room_id.
+Ids are content hashes, so identical custom rooms are stored once, and
+rooms are prepared (voices resolved, system messages built) once per process.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from config import (
+    ROOMS_CONFIG_PATH, DEFAULT_VOICES, ALLOWED_DURATIONS,
+    ROOM_CACHE_SIZE, MAX_ROOM_AGENTS, MAX_AGENT_PROMPT_CHARS
+)
+from repositories import custom_rooms, DatabaseUnavailableError
+
+
+# Added by prepare_room for the server's own use; never sent to clients
+_PREPARED_KEYS = ("system_message",)
+
+
+def room_id_for(room):
+    """Content hash of a room definition (key order and room_id ignored)"""
+    content = {k: v for k, v in room.items() if k != "room_id"}
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+
+def validate_room(room):
+    """Raises ValueError if a client-supplied room can't be run"""
+    if not isinstance(room, dict):
+        raise ValueError("Room must be an object")
+    if not str(room.get("name", "")).strip():
+        raise ValueError("Room needs a name")
+    if room.get("session_duration_minutes") not in ALLOWED_DURATIONS:
+        raise ValueError(f"Duration must be {' or '.join(map(str, ALLOWED_DURATIONS))} minutes")
+    agents = room.get("agents")
+    if not isinstance(agents, list) or not 1 <= len(agents) <= MAX_ROOM_AGENTS:
+        raise ValueError(f"Rooms need between 1 and {MAX_ROOM_AGENTS} agents")
+    for agent in agents:
+        if not isinstance(agent, dict) or not str(agent.get("name", "")).strip():
+            raise ValueError("Every agent needs a name")
+        prompt = agent.get("system_prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise ValueError(f"Agent {agent['name']} needs a system prompt")
+        if len(prompt) > MAX_AGENT_PROMPT_CHARS:
+            raise ValueError(f"Agent {agent['name']}'s prompt is over {MAX_AGENT_PROMPT_CHARS} characters")
+
+
+def prepare_room(room, room_id=None):
+    """
+    Copy of `room` ready for SessionManager: room_id set, every agent's
+    voice resolved and its system message built
+    """
+    prepared = copy.deepcopy(room)
+    prepared["room_id"] = room_id or room_id_for(room)
+    for idx, agent in enumerate(prepared.get("agents", [])):
+        voice = str(agent.get("voice", "")).strip()
+        agent["voice"] = voice if voice.startswith("aura-") else DEFAULT_VOICES[idx % len(DEFAULT_VOICES)]
+        agent["system_message"] = {"role": "system", "content": agent["system_prompt"]}
+    return prepared
+
+
+def public_room(room):
+    """A prepared room without the server-only fields"""
+    public = dict(room)
+    public["agents"] = [
+        {k: v for k, v in agent.items() if k not in _PREPARED_KEYS}
+        for agent in room.get("agents", [])
+    ]
+    return public
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class RoomRegistry:
+    """
+    rooms.json (reloaded when the file changes) plus an LRU of custom rooms
+    backed by the custom_rooms collection
+    """
+
+    def __init__(self, config_path=ROOMS_CONFIG_PATH, cache_size=ROOM_CACHE_SIZE):
+        self.config_path = config_path
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.builtin = []          # Prepared rooms in rooms.json order
+        self.builtin_by_id = {}
+        self.builtin_by_content = {}  # Hashes of raw and public definitions
+        self.builtin_mtime = None
+        self.custom = OrderedDict()  # room_id -> prepared room
+
+    def builtin_rooms(self):
+        """Prepared rooms from rooms.json, in file order"""
+        mtime = os.path.getmtime(self.config_path)
+        with self.lock:
+            if mtime != self.builtin_mtime:
+                with open(self.config_path, "r", encoding="utf-8") as f:
+                    rooms = json.load(f).get("rooms", [])
+                self.builtin = [prepare_room(room) for room in rooms]
+                self.builtin_by_id = {room["room_id"]: room for room in self.builtin}
+                self.builtin_by_content = dict(self.builtin_by_id)
+                self.builtin_by_content.update((room_id_for(public_room(room)), room) for room in self.builtin)
+                self.builtin_mtime = mtime
+                print(f"📚 Loaded {len(self.builtin)} rooms from {self.config_path}")
+            return self.builtin
+
+    def builtin_room(self, index):
+        rooms = self.builtin_rooms()
+        if not isinstance(index, int) or not 0 <= index < len(rooms):
+            raise ValueError(f"Unknown room index: {index}")
+        return rooms[index]
+
+    def match_builtin(self, room):
+        """
+        The built-in room an inline payload is a copy of (as in rooms.json
+        or as served by /api/rooms), or None
+        """
+        self.builtin_rooms()
+        with self.lock:
+            return self.builtin_by_id.get(room.get("room_id")) or self.builtin_by_content.get(room_id_for(room))
+
+    def get(self, room_id):
+        """Prepared room for an id, or None"""
+        self.builtin_rooms()
+        with self.lock:
+            room = self.builtin_by_id.get(room_id) or self.custom.get(room_id)
+            if room is not None:
+                if room_id in self.custom:
+                    self.custom.move_to_end(room_id)
+                return room
+
+        try:
+            stored = custom_rooms.get(room_id)
+        except DatabaseUnavailableError:
+            return None
+        except Exception as e:
+            print(f"❌ Custom room lookup error: {e}")
+            return None
+        if stored is None:
+            return None
+        return self._cache(prepare_room(stored, room_id))
+
+    def register(self, room):
+        """
+        Save a validated custom room (once per distinct definition) and
+        return it prepared, with its room_id
+        """
+        room_id = room_id_for(room)
+        existing = self.get(room_id)
+        if existing is not None:
+            return existing
+
+        try:
+            custom_rooms.save(room_id, room, datetime.now())
+        except DatabaseUnavailableError:
+            pass  # Cache only, as without MongoDB
+        except Exception as e:
+            # Still usable from the cache until it is evicted
+            print(f"❌ Custom room save error: {e}")
+        return self._cache(prepare_room(room, room_id))
+
+    def _cache(self, room):
+        with self.lock:
+            self.custom[room["room_id"]] = room
+            self.custom.move_to_end(room["room_id"])
+            while len(self.custom) > self.cache_size:
+                self.custom.popitem(last=False)
+        return room
+
+
+# Shared by routes and socket handlers
+room_registry = RoomRegistry()
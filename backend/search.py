@@ -0,0 +1,163 @@
+"""
+AURA Transcript Search
+Every logged message is also written to the `messages` collection, whose
+text index answers /api/search without scanning session documents.
+
+Index sessions logged before search existed with:
+    python search.py --backfill
+"""
+
+import argparse
+import re
+from datetime import datetime
+
+from config import (
+    SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE, SEARCH_MAX_RESULTS, SEARCH_SNIPPET_CHARS
+)
+from repositories import messages, sessions
+
+
+# ============================================================================
+# INDEXING
+# ============================================================================
+
+def message_doc(session_id, room_name, entry):
+    """messages document for one LogEntry-shaped dict"""
+    doc = {
+        "session_id": session_id,
+        "room_name": room_name,
+        "role": entry["role"],
+        "content": entry["content"],
+        "timestamp": entry["timestamp"]
+    }
+    if entry.get("agent"):
+        doc["agent"] = entry["agent"]
+    return doc
+
+
+def index_message(session_id, room_name, entry):
+    """Add one message to the search collection"""
+    try:
+        messages.insert(message_doc(session_id, room_name, entry))
+    except Exception as e:
+        print(f"❌ Search index error: {e}")
+
+
+def backfill_messages(batch_size=500):
+    """Index the conversations of sessions logged before search existed"""
+    indexed = 0
+    for session in sessions.unindexed_cursor(batch_size):
+        docs = []
+        for entry in session.get("conversation", []):
+            entry = dict(entry)
+            if isinstance(entry.get("timestamp"), str):
+                entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+            docs.append(message_doc(session["_id"], session.get("room_name"), entry))
+        if docs:
+            messages.insert_many(docs)
+        sessions.mark_indexed(session["_id"])
+        indexed += len(docs)
+    print(f"✅ Indexed {indexed} messages")
+    return indexed
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+def _terms(query):
+    """Words to highlight: the query minus negations, quotes and punctuation"""
+    words = re.findall(r'-?"[^"]*"|-?\S+', query)
+    terms = []
+    for word in words:
+        if word.startswith("-"):
+            continue
+        terms.extend(re.findall(r"\w+", word))
+    return [t for t in terms if len(t) > 1]
+
+
+def make_snippet(content, terms, width=SEARCH_SNIPPET_CHARS):
+    """
+    Window of `content` around the first matching term, with the [start, end)
+    offsets of every match inside it. Terms match as word prefixes, roughly
+    following MongoDB's stemming.
+    """
+    if not terms:
+        return content[:width], []
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(t[:max(3, len(t) - 2)]) for t in terms) + r")\w*",
+                         re.IGNORECASE)
+    first = pattern.search(content)
+    start = 0
+    if first and first.start() > width // 3:
+        start = first.start() - width // 3
+        # Don't cut a word in half
+        space = content.rfind(" ", 0, start)
+        start = space + 1 if space >= 0 and start - space < 20 else start
+    snippet = content[start:start + width]
+    highlights = [[m.start(), m.end()] for m in pattern.finditer(snippet)]
+    if start > 0:
+        snippet = "…" + snippet
+        highlights = [[s + 1, e + 1] for s, e in highlights]
+    if start + width < len(content):
+        snippet += "…"
+    return snippet, highlights
+
+
+def search_messages(query, room=None, since=None, until=None, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    One page of messages matching `query` (MongoDB $text syntax: words,
+    "phrases", -exclusions), best match first
+    """
+    page_size = max(1, min(page_size, SEARCH_MAX_PAGE_SIZE))
+    page = max(1, page)
+    skip = (page - 1) * page_size
+    if skip + page_size > SEARCH_MAX_RESULTS:
+        raise ValueError(f"Only the first {SEARCH_MAX_RESULTS} results can be paged through")
+
+    criteria = {"$text": {"$search": query}}
+    if room:
+        criteria["room_name"] = room
+    if since or until:
+        criteria["timestamp"] = {}
+        if since:
+            criteria["timestamp"]["$gte"] = since
+        if until:
+            criteria["timestamp"]["$lt"] = until
+
+    # One extra tells us whether there is a next page
+    docs = messages.text_search(criteria, skip, page_size + 1)
+
+    terms = _terms(query)
+    results = []
+    for doc in docs[:page_size]:
+        snippet, highlights = make_snippet(doc["content"], terms)
+        results.append({
+            "session_id": str(doc["session_id"]),
+            "room": doc.get("room_name"),
+            "role": doc["role"],
+            "agent": doc.get("agent"),
+            "timestamp": doc["timestamp"].isoformat() if isinstance(doc["timestamp"], datetime) else doc["timestamp"],
+            "score": doc["score"],
+            "snippet": snippet,
+            "highlights": highlights
+        })
+    return {
+        "results": results,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(docs) > page_size
+    }
+
+
+if __name__ == "__main__":
+    from database import initialize_mongodb
+
+    parser = argparse.ArgumentParser(description="AURA transcript search index")
+    parser.add_argument("--backfill", action="store_true", help="Index sessions logged before search existed")
+    args = parser.parse_args()
+    if args.backfill:
+        if not initialize_mongodb():
+            raise SystemExit(1)
+        backfill_messages()
+    else:
+        parser.print_help()
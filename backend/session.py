@@ -3,11 +3,134 @@ AURA Session Management
 Handles conversation sessions, context, and agent processing with MongoDB
 """
 
+import sys
 import json
+import secrets
+import time
+import base64
+import threading
+from collections import deque
 from datetime import datetime, timedelta
 from pathlib import Path
 from config import *
-from database import db # <-- ADDED: Import the database object
+from repositories import sessions, DatabaseUnavailableError
+from audio_store import get_audio_store, synthesis_key
+from analytics import TurnStats, record_session
+from search import index_message
+from answer_cache import answer_cache
+import metrics
+
+
+# ============================================================================
+# CONVERSATION LOG
+# ============================================================================
+
+class LogEntry:
+    """One conversation message, kept compact while it sits in memory"""
+    
+    __slots__ = ("timestamp", "role", "content", "agent", "interrupted")
+    
+    def __init__(self, role, content, agent=None, interrupted=False):
+        self.timestamp = time.time()
+        self.role = sys.intern(role)
+        self.content = content
+        self.agent = sys.intern(agent) if agent else None
+        self.interrupted = interrupted
+    
+    def to_dict(self):
+        """Document shape stored in MongoDB"""
+        entry = {
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "role": self.role,
+            "content": self.content
+        }
+        if self.agent:
+            entry["agent"] = self.agent
+        if self.interrupted:
+            entry["interrupted"] = True
+        return entry
+
+
+# ============================================================================
+# EVENT BUFFER (resumable sessions)
+# ============================================================================
+
+class EventBuffer:
+    """
+    Events emitted to a session's client, numbered and kept until the client
+    acknowledges them so a reconnecting client can pick up where it left off.
+    Bounded by count and by bytes; past either, the oldest are dropped.
+    """
+    
+    def __init__(self, max_events=EVENT_BUFFER_SIZE, max_bytes=EVENT_BUFFER_MAX_BYTES):
+        self.events = deque()  # (seq, event, payload, size)
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.dropped_through = 0  # Highest unacknowledged seq evicted to stay in bounds
+        self.next_seq = 1
+        self.lock = threading.RLock()
+    
+    @staticmethod
+    def _payload_size(payload):
+        # Strings (base64 audio, text) are nearly all of it
+        return 64 + sum(len(v) for v in payload.values() if isinstance(v, str))
+    
+    def record(self, event, payload):
+        """Number and keep one event; returns the payload with its event_seq"""
+        with self.lock:
+            payload = dict(payload, event_seq=self.next_seq)
+            size = self._payload_size(payload)
+            self.events.append((self.next_seq, event, payload, size))
+            self.size += size
+            self.next_seq += 1
+            while len(self.events) > self.max_events or (self.size > self.max_bytes and len(self.events) > 1):
+                seq, _, _, dropped = self.events.popleft()
+                self.size -= dropped
+                self.dropped_through = seq
+            return payload
+    
+    def ack(self, seq):
+        """Drop everything up to and including `seq`"""
+        with self.lock:
+            while self.events and self.events[0][0] <= seq:
+                self.size -= self.events.popleft()[3]
+    
+    def since(self, seq):
+        """(event, payload) pairs emitted after `seq`, oldest first"""
+        with self.lock:
+            return [(event, payload) for s, event, payload, _ in self.events if s > seq]
+    
+    def complete_since(self, seq):
+        """Whether since(seq) has every event after `seq` (none were evicted)"""
+        with self.lock:
+            return seq >= self.dropped_through
+
+
+# ============================================================================
+# TURNS
+# ============================================================================
+
+class Turn:
+    """
+    One user turn. Owns the session's agent pipeline until it finishes or
+    a newer turn (barge-in) cancels it.
+    """
+    
+    def __init__(self, turn_id, previous=None):
+        self.turn_id = turn_id
+        self.previous = previous           # Turn this one interrupted, if any
+        self.cancel_event = threading.Event()
+        self.finished = threading.Event()
+        self.spoken_agents = []            # Agents whose response reached the client
+        self.interrupted_agent = None      # Agent cut off mid-response
+    
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+    
+    def cancel(self):
+        self.cancel_event.set()
 
 
 # ============================================================================
@@ -20,13 +143,39 @@ class SessionManager:
     and MongoDB persistence.
     """
     
-    def __init__(self, room, duration_minutes):
+    def __init__(self, room, duration_minutes, audio_format=DEFAULT_TTS_FORMAT, stream_audio=False,
+                 audio_urls=False, profile=False):
         self.room = room
+        self.audio_format = audio_format
+        self.stream_audio = stream_audio  # Client plays agent_audio_chunk events
+        # Client fetches clips from /api/audio/<clip_id> instead of inline base64
+        self.audio_urls = audio_urls
+        # Replayed cached answers need their audio kept, whatever the delivery
+        self.answer_caching = answer_cache.enabled_for(room)
+        self.audio_store = get_audio_store() if audio_urls or self.answer_caching else None
         self.start_time = datetime.now()
         self.duration = timedelta(minutes=duration_minutes)
         self.end_time = self.start_time + self.duration
-        self.conversation_log = [] # Kept for in-memory context
-        self.context = []
+        # Recent history only; MongoDB is the system of record
+        self.conversation_log = deque(maxlen=CONVERSATION_LOG_SIZE)
+        self.context = deque(maxlen=MAX_CONTEXT_MESSAGES)
+        self.last_turn_timings = None  # Per-stage latencies of the latest turn
+        self.profile = profile  # Profile every turn (see profiling.py)
+        self.turn_stats = TurnStats()  # Folded into the room's daily rollup by save_log
+        self.context_lock = threading.Lock()
+        self.turn_lock = threading.Lock()
+        self.current_turn = None
+        self.turn_count = 0
+        # LLM token counts for the whole session and per agent
+        self.token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+                            "calls": 0, "agents": {}}
+        self.token_budget = room.get('token_budget', SESSION_TOKEN_BUDGET)
+        
+        # Resumable: the client reconnects with this token, not its old sid
+        self.resume_token = secrets.token_urlsafe(24)
+        self.sid = None               # Socket currently attached, None while disconnected
+        self.disconnected_at = None
+        self.events = EventBuffer()
         
         # --- MODIFIED: MongoDB is now the primary session store ---
         self.session_id = None
@@ -34,19 +183,13 @@ class SessionManager:
     
     def _create_mongodb_session(self):
         """Create a new session document in MongoDB"""
-        if db is not None:
-            try:
-                session_doc = {
-                    "room_name": self.room['name'],
-                    "start_time": self.start_time,
-                    "status": "active",
-                    "conversation": []
-                }
-                result = db.sessions.insert_one(session_doc)
-                self.session_id = result.inserted_id
-                print(f"📄 New MongoDB session created with ID: {self.session_id}")
-            except Exception as e:
-                print(f"❌ MongoDB session creation error: {e}")
+        try:
+            self.session_id = sessions.create(self.room['name'], self.start_time)
+            print(f"📄 New MongoDB session created with ID: {self.session_id}")
+        except DatabaseUnavailableError:
+            pass  # Running without MongoDB; the session still works
+        except Exception as e:
+            print(f"❌ MongoDB session creation error: {e}")
     
     def is_expired(self):
         """Check if session time expired"""
@@ -57,29 +200,53 @@ class SessionManager:
         remaining = self.end_time - datetime.now()
         return max(0, int(remaining.total_seconds()))
     
-    def log_interaction(self, role, content, agent_name=None):
+    def begin_turn(self):
+        """Take over the session for a new turn, cancelling any running one"""
+        with self.turn_lock:
+            previous = self.current_turn
+            if previous is not None and not previous.finished.is_set():
+                previous.cancel()
+            else:
+                previous = None
+            self.turn_count += 1
+            turn = Turn(self.turn_count, previous)
+            self.current_turn = turn
+            return turn
+    
+    def interrupt(self):
+        """Cancel the running turn; returns False if nothing was running"""
+        with self.turn_lock:
+            turn = self.current_turn
+            if turn is None or turn.finished.is_set():
+                return False
+            turn.cancel()
+            return True
+    
+    def finish_turn(self, turn):
+        """Release the session once a turn has stopped emitting"""
+        turn.finished.set()
+        turn.previous = None
+        with self.turn_lock:
+            if self.current_turn is turn:
+                self.current_turn = None
+    
+    def log_interaction(self, role, content, agent_name=None, interrupted=False):
         """
         Log conversation interaction to memory and MongoDB in real-time.
         """
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "role": role,
-            "content": content
-        }
-        if agent_name:
-            log_entry["agent"] = agent_name
-        
+        log_entry = LogEntry(role, content, agent_name, interrupted)
         self.conversation_log.append(log_entry)
         
         # --- MODIFIED: Push each message to the DB as it happens ---
-        if db is not None and self.session_id:
+        if self.session_id:
+            entry = log_entry.to_dict()
             try:
-                db.sessions.update_one(
-                    {"_id": self.session_id},
-                    {"$push": {"conversation": log_entry}}
-                )
+                sessions.append_message(self.session_id, entry)
             except Exception as e:
                 print(f"❌ MongoDB log update error: {e}")
+            else:
+                entry["timestamp"] = datetime.fromtimestamp(log_entry.timestamp)
+                index_message(self.session_id, self.room['name'], entry)
     
     def get_voice_for_agent(self, agent, agent_index):
         """Get voice for agent with fallback"""
@@ -88,16 +255,38 @@ class SessionManager:
             return voice
         return DEFAULT_VOICES[agent_index % len(DEFAULT_VOICES)]
     
-    def process_agents_streaming(self, user_text, llm_handler, deepgram_handler, emit_callback):
+    def process_agents_streaming(self, user_text, llm_handler, deepgram_handler, emit_callback, turn=None):
         """
         Process user input through agents with PSEUDO-STREAMING.
+        Stops between (and during) agents once `turn` is cancelled; only
+        agents that actually spoke are kept in the context.
         """
+        if turn is None:
+            turn = Turn(0)
+        if turn.previous is not None:
+            # Let the interrupted turn record what it said before we read context
+            turn.previous.finished.wait(TURN_HANDOFF_TIMEOUT)
+        
         agent_responses = []
+        agent_timings = []
         agents = self.room['agents']
+        turn_started = time.perf_counter()
+        used_fallback = False
+        
+        # Cached answers only stand in for opening questions, where no
+        # earlier conversation could change what the council would say
+        cached = None
+        if self.answer_caching:
+            with self.context_lock:
+                fresh = not self.context
+            if fresh:
+                cached = answer_cache.lookup(self.room, user_text)
         
         print(f"\n🎯 Processing {len(agents)} agents (streaming mode)")
         
         for idx, agent in enumerate(agents):
+            if turn.cancelled:
+                break
             agent_name = agent.get('name', f'Agent {idx + 1}')
             
             emit_callback('agent_status', {
@@ -105,71 +294,293 @@ class SessionManager:
                 'message': f'{agent_name} is thinking...'
             })
             
-            messages = [{"role": "system", "content": agent['system_prompt']}]
-            for ctx in self.context[-MAX_CONTEXT_MESSAGES:]:
-                messages.append(ctx)
-            
-            if agent_responses:
-                context_text = f"User: {user_text}\n\nPrevious responses:\n"
-                for prev_name, prev_resp in agent_responses:
-                    context_text += f"{prev_name}: {prev_resp}\n"
-                messages.append({"role": "user", "content": context_text})
+            llm_started = time.perf_counter()
+            usage = {}
+            if cached is not None:
+                response = cached.responses[idx][1]
             else:
-                messages.append({"role": "user", "content": user_text})
-            
-            response = llm_handler.chat(messages)
+                response = llm_handler.chat(
+                    self._agent_messages(agent, user_text, agent_responses),
+                    cancel_event=turn.cancel_event,
+                    model=self._agent_model(agents, idx, turn_started),
+                    max_tokens=agent.get('max_tokens'),
+                    usage=usage
+                )
+            llm_ms = (time.perf_counter() - llm_started) * 1000
+            self._record_usage(agent_name, usage)
+            if turn.cancelled:
+                break
             if not response:
                 response = f"I'm {agent_name}. Let me think about that."
+                used_fallback = True
                 print(f"⚠️ Using fallback for {agent_name}")
             
-            agent_responses.append((agent_name, response))
             print(f"✅ {agent_name}: {response[:60]}...")
-            self.log_interaction('assistant', response, agent_name=agent_name)
-            
             voice = self.get_voice_for_agent(agent, idx)
-            audio_b64 = deepgram_handler.synthesize(response, voice)
             
-            if audio_b64:
+            if self.stream_audio:
+                emit_started = time.perf_counter()
                 emit_callback('agent_response', {
                     'agent': agent_name,
                     'text': response,
-                    'audio': audio_b64,
+                    'streamed': True,
+                    'audio_format': self.audio_format,
+                    'mime_type': TTS_FORMATS[self.audio_format]['mime_type'],
                     'voice': voice,
                     'remaining_time': self.remaining_time(),
                     'agent_index': idx,
-                    'total_agents': len(agents)
+                    'total_agents': len(agents),
+                    'turn_id': turn.turn_id
                 })
-                print(f"📤 Streamed {agent_name}'s response to frontend")
+                emit_ms = (time.perf_counter() - emit_started) * 1000
+                
+                tts_started = time.perf_counter()
+                self._stream_agent_audio(deepgram_handler, response, voice, agent_name, idx, emit_callback, turn)
+                tts_ms = (time.perf_counter() - tts_started) * 1000
             else:
-                print(f"⚠️ Audio generation failed for {agent_name}")
+                tts_started = time.perf_counter()
+                audio_fields = self._synthesize_clip(deepgram_handler, response, voice)
+                tts_ms = (time.perf_counter() - tts_started) * 1000
+                if turn.cancelled:
+                    break
+                
+                emit_started = time.perf_counter()
+                if audio_fields:
+                    emit_callback('agent_response', {
+                        'agent': agent_name,
+                        'text': response,
+                        **audio_fields,
+                        'audio_format': self.audio_format,
+                        'mime_type': TTS_FORMATS[self.audio_format]['mime_type'],
+                        'voice': voice,
+                        'remaining_time': self.remaining_time(),
+                        'agent_index': idx,
+                        'total_agents': len(agents),
+                        'turn_id': turn.turn_id
+                    })
+                    print(f"📤 Streamed {agent_name}'s response to frontend")
+                else:
+                    print(f"⚠️ Audio generation failed for {agent_name}")
+                emit_ms = (time.perf_counter() - emit_started) * 1000
+            
+            cut_off = turn.cancelled
+            if cut_off:
+                turn.interrupted_agent = agent_name
+            turn.spoken_agents.append(agent_name)
+            agent_responses.append((agent_name, response))
+            self.log_interaction('assistant', response, agent_name=agent_name, interrupted=cut_off)
+            
+            agent_timings.append({
+                "agent": agent_name,
+                "llm_ms": llm_ms,
+                "tts_ms": tts_ms,
+                "emit_ms": emit_ms,
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0)
+            })
+        
+        self.last_turn_timings = {
+            "agents": agent_timings,
+            "total_ms": (time.perf_counter() - turn_started) * 1000,
+            "cached": cached is not None
+        }
+        if agent_timings:
+            self.turn_stats.add_turn(agent_timings, self.last_turn_timings["total_ms"], turn.cancelled,
+                                     cached=cached is not None)
         
-        final_combined = " ".join([resp[1] for resp in agent_responses])
-        self.context.extend([
-            {"role": "user", "content": user_text},
-            {"role": "assistant", "content": final_combined}
-        ])
+        if turn.cancelled:
+            print(f"🛑 Turn {turn.turn_id} interrupted after {len(turn.spoken_agents)} agent(s)")
+        elif self.answer_caching and fresh and cached is None and not used_fallback \
+                and len(agent_responses) == len(agents):
+            tokens = sum(t["prompt_tokens"] + t["completion_tokens"] for t in agent_timings)
+            tts_seconds = sum(t["tts_ms"] for t in agent_timings) / 1000
+            answer_cache.store(self.room, user_text, agent_responses, tokens, tts_seconds)
+        
+        if agent_responses:
+            final_combined = " ".join([resp[1] for resp in agent_responses])
+            with self.context_lock:
+                self.context.extend([
+                    {"role": "user", "content": user_text[:MAX_CONTEXT_CHARS]},
+                    {"role": "assistant", "content": final_combined[:MAX_CONTEXT_CHARS]}
+                ])
         
         return agent_responses
     
+    def _record_usage(self, agent_name, usage):
+        """
+        Add one completion's token counts to the session totals. Once the
+        session passes its token budget, only the most recent exchange is
+        kept as context for later turns.
+        """
+        if not usage:
+            return
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        metrics.incr("llm_prompt_tokens", prompt_tokens, room=self.room['name'], agent=agent_name)
+        metrics.incr("llm_completion_tokens", completion_tokens, room=self.room['name'], agent=agent_name)
+        
+        with self.context_lock:
+            for totals in (self.token_usage,
+                           self.token_usage["agents"].setdefault(agent_name, {
+                               "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "calls": 0})):
+                totals["prompt_tokens"] += prompt_tokens
+                totals["completion_tokens"] += completion_tokens
+                totals["total_tokens"] += prompt_tokens + completion_tokens
+                totals["calls"] += 1
+            
+            over_budget = self.token_budget and self.token_usage["total_tokens"] > self.token_budget
+            if over_budget and self.context.maxlen > BUDGET_CONTEXT_MESSAGES:
+                self.context = deque(self.context, maxlen=BUDGET_CONTEXT_MESSAGES)
+                metrics.incr("token_budget_exceeded", room=self.room['name'])
+                print(f"🪙 Session over its {self.token_budget} token budget; context trimmed")
+    
+    def _agent_messages(self, agent, user_text, agent_responses):
+        """Prompt for one agent: system message, context, then the question"""
+        # Rooms from the registry carry their system message prebuilt
+        messages = [agent.get('system_message') or {"role": "system", "content": agent['system_prompt']}]
+        with self.context_lock:
+            messages.extend(self.context)
+        
+        if agent_responses:
+            context_text = f"User: {user_text}\n\nPrevious responses:\n"
+            for prev_name, prev_resp in agent_responses:
+                context_text += f"{prev_name}: {prev_resp}\n"
+            messages.append({"role": "user", "content": context_text})
+        else:
+            messages.append({"role": "user", "content": user_text})
+        return messages
+    
+    def _agent_model(self, agents, agent_index, turn_started):
+        """Agent's configured model, or the fast one if the turn is running late"""
+        model = agents[agent_index].get('model')
+        if self._behind_budget(agents, agent_index, turn_started):
+            agent_name = agents[agent_index].get('name', f'Agent {agent_index + 1}')
+            model = CEREBRAS_FAST_MODEL
+            metrics.incr("llm_budget_downgrades", agent=agent_name)
+            print(f"⏱️ Turn behind budget; {agent_name} using {model}")
+        return model
+    
+    def _behind_budget(self, agents, agent_index, turn_started):
+        """
+        Whether the turn has already used the latency budgets of the agents
+        before this one (only when every one of them declares a budget)
+        """
+        if not BUDGET_DOWNGRADE_ENABLED or agent_index == 0:
+            return False
+        budgets = [a.get('latency_budget_ms') for a in agents[:agent_index]]
+        if not all(budgets):
+            return False
+        return (time.perf_counter() - turn_started) * 1000 > sum(budgets)
+    
+    def _synthesize_clip(self, deepgram_handler, text, voice):
+        """
+        Audio fields for agent_response: a clip URL when the client asked for
+        one, else base64. With an audio store, text we have voiced before is
+        not synthesized again.
+        """
+        if self.audio_store is None:
+            audio_b64 = deepgram_handler.synthesize(text, voice, self.audio_format)
+            return {'audio': audio_b64} if audio_b64 else None
+        
+        key = synthesis_key(text, voice, self.audio_format)
+        clip_id = self.audio_store.find(key)
+        audio = None
+        if clip_id is not None and not self.audio_urls:
+            audio = self.audio_store.read(clip_id)
+            clip_id = clip_id if audio else None
+        if clip_id is None:
+            audio = deepgram_handler.synthesize_bytes(text, voice, self.audio_format)
+            if not audio:
+                return None
+            clip_id = self.audio_store.put(audio, self.audio_format, key)
+        
+        if self.audio_urls:
+            return {'audio_url': f"/api/audio/{clip_id}"}
+        return {'audio': base64.b64encode(audio).decode('utf-8')}
+    
+    def _stream_agent_audio(self, deepgram_handler, text, voice, agent_name, agent_index, emit_callback, turn=None):
+        """
+        Forward TTS audio as agent_audio_chunk events while it is generated.
+        The final event has final=True and no audio (plus the stored clip's
+        audio_url when URLs are enabled). Stops early (closing the provider
+        stream) once the turn is cancelled.
+        """
+        seq = 0
+        turn_id = turn.turn_id if turn else None
+        key = clip_id = None
+        collected = None
+        stream = None
+        completed = False
+        try:
+            audio = None
+            if self.audio_store is not None:
+                key = synthesis_key(text, voice, self.audio_format)
+                clip_id = self.audio_store.find(key)
+                if clip_id is not None:
+                    audio = self.audio_store.read(clip_id)
+            if audio is not None:
+                stream = iter([
+                    audio[offset:offset + TTS_STREAM_CHUNK_BYTES]
+                    for offset in range(0, len(audio), TTS_STREAM_CHUNK_BYTES)
+                ])
+            else:
+                # Not cached, or pruned since the lookup: synthesize and store again
+                clip_id = None
+                stream = deepgram_handler.synthesize_stream(text, voice, self.audio_format)
+                collected = bytearray() if key else None
+            
+            for chunk in stream:
+                if turn is not None and turn.cancelled:
+                    break
+                if collected is not None:
+                    collected.extend(chunk)
+                emit_callback('agent_audio_chunk', {
+                    'agent': agent_name,
+                    'agent_index': agent_index,
+                    'seq': seq,
+                    'audio': base64.b64encode(chunk).decode('utf-8'),
+                    'final': False,
+                    'turn_id': turn_id
+                })
+                seq += 1
+            else:
+                completed = True
+        except Exception as e:
+            print(f"❌ TTS stream error for {agent_name}: {e}")
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+        
+        if completed and collected:
+            clip_id = self.audio_store.put(bytes(collected), self.audio_format, key)
+        
+        final_event = {
+            'agent': agent_name,
+            'agent_index': agent_index,
+            'seq': seq,
+            'audio': '',
+            'final': True,
+            'turn_id': turn_id
+        }
+        if completed and clip_id and self.audio_urls:
+            final_event['audio_url'] = f"/api/audio/{clip_id}"
+        emit_callback('agent_audio_chunk', final_event)
+        print(f"📤 Streamed {agent_name}'s audio in {seq} chunks")
+        return seq
+    
     def save_log(self):
         """Finalize the session log in MongoDB."""
         
         # --- MODIFIED: This function now updates the DB record instead of writing a file ---
-        if db is not None and self.session_id:
+        if self.session_id:
             try:
                 end_time = datetime.now()
                 duration = (end_time - self.start_time).total_seconds()
                 
-                db.sessions.update_one(
-                    {"_id": self.session_id},
-                    {"$set": {
-                        "end_time": end_time,
-                        "status": "completed",
-                        "duration_seconds": duration
-                    }}
-                )
+                sessions.finalize(self.session_id, end_time, duration, self.token_usage)
                 print(f"💾 Session {self.session_id} finalized in MongoDB.")
+                record_session(self.room['name'], self.start_time, duration, self.turn_stats, self.token_usage)
             except Exception as e:
                 print(f"❌ MongoDB finalization error: {e}")
         else:
-            print("⚠️ MongoDB not connected. Could not finalize session in DB.")
\ No newline at end of file
+            print("⚠️ MongoDB not connected. Could not finalize session in DB.")
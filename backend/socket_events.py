@@ -4,23 +4,47 @@ Real-time communication between frontend and backend
 """
 
 import os
-import json
+import time
 import tempfile
 import shutil
+import threading
 from flask import request
 from flask_socketio import emit
 from session import SessionManager
-from handlers import AudioHandler, deepgram_client, cerebras_handler, initialize_handlers
-
-# Ensure handlers are initialized
-initialize_handlers()
+from config import TTS_FORMATS, SERVER_BUSY_RETRY_AFTER, RESUME_GRACE_PERIOD, PROFILE_SESSION_OPT_IN
+from handlers import AudioHandler, get_deepgram_client, get_cerebras_handler, negotiate_audio_format
+from auth import authenticate_socket
+from admission import admission, ServerBusyError
+from profiling import profiler
+from rooms import room_registry, validate_room
 
 
 # ============================================================================
 # ACTIVE SESSIONS STORE
 # ============================================================================
 
-active_sessions = {}
+active_sessions = {}  # resume token -> SessionManager
+sid_sessions = {}     # sid -> resume token of the session it is attached to
+connected_users = {}  # sid -> user id (None for anonymous sockets)
+sessions_lock = threading.Lock()
+
+
+def session_for_sid(sid):
+    with sessions_lock:
+        token = sid_sessions.get(sid)
+        return active_sessions.get(token) if token else None
+
+
+def finalize_session(session):
+    """Stop any running turn, save the log and forget the session"""
+    with sessions_lock:
+        if active_sessions.pop(session.resume_token, None) is None:
+            return False
+        if session.sid is not None:
+            sid_sessions.pop(session.sid, None)
+    session.interrupt()
+    session.save_log()
+    return True
 
 
 # ============================================================================
@@ -30,28 +54,74 @@ active_sessions = {}
 def register_socket_events(socketio):
     """Register all SocketIO event handlers"""
     
+    def send(session, event, payload):
+        """
+        Emit a session event to whichever socket is attached now. Events are
+        buffered either way, so a client that drops mid-turn can resume.
+        """
+        with session.events.lock:
+            payload = session.events.record(event, payload)
+            if session.sid is not None:
+                socketio.emit(event, payload, to=session.sid)
+    
+    def expire_if_abandoned(session, disconnected_at):
+        if session.disconnected_at == disconnected_at and finalize_session(session):
+            print(f"⌛ Session not resumed within {RESUME_GRACE_PERIOD}s; finalized")
+    
+    @socketio.on('connect')
+    def handle_connect(auth=None):
+        """Verify the client's JWT (cached) before accepting the socket"""
+        user_id = authenticate_socket(auth)
+        if user_id is False:
+            print(f"🔒 Rejected unauthenticated socket: {request.sid}")
+            return False
+        connected_users[request.sid] = user_id
+    
+    
     @socketio.on('start_session')
     def handle_start_session(data):
         """Initialize new conversation session"""
+        if admission.saturated():
+            # Shed load before the client commits to a session we can't serve
+            return emit('server_busy', {
+                'message': 'AURA is at capacity. Please try again shortly.',
+                'retry_after': SERVER_BUSY_RETRY_AFTER
+            })
+        
         try:
-            room_data = data.get('room')
-            
-            if not room_data:
-                # Load from rooms.json
-                with open('rooms.json', 'r', encoding='utf-8') as f:
-                    rooms = json.load(f)
-                room_index = data.get('room_index', 0)
-                selected_room = rooms['rooms'][room_index]
+            if data.get('room_id'):
+                selected_room = room_registry.get(data['room_id'])
+                if selected_room is None:
+                    return emit('error', {'message': 'Unknown room', 'recoverable': False})
+            elif data.get('room'):
+                # Older clients send the whole room; built-in rooms keep
+                # their own durations, only custom ones are validated
+                selected_room = (isinstance(data['room'], dict) and room_registry.match_builtin(data['room']))
+                if not selected_room:
+                    validate_room(data['room'])
+                    selected_room = room_registry.register(data['room'])
             else:
-                # Custom room provided
-                selected_room = room_data
+                selected_room = room_registry.builtin_room(data.get('room_index', 0))
+            
+            # Pick the most compact audio format the client can play
+            audio_format = negotiate_audio_format(data.get('audio_formats'))
             
             # Create session
             session = SessionManager(
                 selected_room,
-                selected_room['session_duration_minutes']
+                selected_room['session_duration_minutes'],
+                audio_format,
+                stream_audio=bool(data.get('stream_audio')),
+                audio_urls=data.get('audio_delivery') == 'url',
+                profile=PROFILE_SESSION_OPT_IN and bool(data.get('profile'))
             )
-            active_sessions[request.sid] = session
+            previous = session_for_sid(request.sid)
+            if previous:
+                finalize_session(previous)
+            session.sid = request.sid
+            with sessions_lock:
+                active_sessions[session.resume_token] = session
+                sid_sessions[request.sid] = session.resume_token
             
             # Log greeting
             greeting = selected_room.get('greeting', 'Hello! How can I help?')
@@ -59,8 +129,9 @@ def register_socket_events(socketio):
             
             print(f"✅ Session started: {selected_room['name']} ({request.sid})")
             
-            emit('session_started', {
+            send(session, 'session_started', {
                 'room': selected_room['name'],
+                'room_id': selected_room['room_id'],
                 'duration': selected_room['session_duration_minutes'],
                 'agents': [
                     {
@@ -69,7 +140,12 @@ def register_socket_events(socketio):
                     }
                     for idx, a in enumerate(selected_room['agents'])
                 ],
-                'greeting': greeting
+                'greeting': greeting,
+                'audio_format': audio_format,
+                'mime_type': TTS_FORMATS[audio_format]['mime_type'],
+                'stream_audio': session.stream_audio,
+                'audio_delivery': 'url' if session.audio_urls else 'inline',
+                'resume_token': session.resume_token
             })
             
         except Exception as e:
@@ -85,7 +161,7 @@ def register_socket_events(socketio):
         Process user audio with PSEUDO-STREAMING
         Each agent response is sent immediately after generation
         """
-        session = active_sessions.get(request.sid)
+        session = session_for_sid(request.sid)
         
         if not session:
             return emit('error', {
@@ -94,20 +170,41 @@ def register_socket_events(socketio):
             })
         
         if session.is_expired():
-            return emit('session_expired', {
+            return send(session, 'session_expired', {
                 'message': 'Session time limit reached',
                 'recoverable': False
             })
         
+        # Barge-in: a new utterance cancels whatever the agents are still saying
+        turn = session.begin_turn()
         temp_dir = None
+        admitted = False
+        profile = None
         
         try:
+            admitted = admission.acquire(
+                on_position=lambda position: send(session, 'queued', {
+                    'position': position,
+                    'turn_id': turn.turn_id
+                }),
+                cancel_event=turn.cancel_event
+            )
+            if not admitted:
+                if not turn.cancelled:
+                    send(session, 'error', {
+                        'message': 'The server is busy. Please try again.',
+                        'recoverable': True
+                    })
+                return
+            
+            profile = profiler.start_turn(session, turn.turn_id)
+            
             # Create temp directory
             temp_dir = tempfile.mkdtemp()
             
             audio_base64 = data.get('audio')
             if not audio_base64:
-                return emit('error', {
+                return send(session, 'error', {
                     'message': 'No audio data received',
                     'recoverable': True
                 })
@@ -117,62 +214,150 @@ def register_socket_events(socketio):
             AudioHandler.save_wav_from_base64(audio_base64, audio_file)
             
             # Transcribe
-            emit('status', {'message': 'Listening...', 'type': 'transcribing'})
-            user_text = deepgram_client.transcribe(audio_file)
+            send(session, 'status', {'message': 'Listening...', 'type': 'transcribing'})
+            user_text = get_deepgram_client().transcribe(audio_file)
+            
+            if turn.cancelled:
+                # The user spoke again while we were transcribing
+                return
             
             if not user_text:
-                return emit('error', {
+                return send(session, 'error', {
                     'message': 'Could not understand. Please try again.',
                     'recoverable': True
                 })
             
             # Log and send transcription
             session.log_interaction('user', user_text)
-            emit('transcription', {'text': user_text})
+            send(session, 'transcription', {'text': user_text, 'turn_id': turn.turn_id})
             
             # Process through agents with STREAMING
-            emit('status', {'message': 'Processing...', 'type': 'processing'})
+            send(session, 'status', {'message': 'Processing...', 'type': 'processing'})
             
             agent_responses = session.process_agents_streaming(
                 user_text,
-                cerebras_handler,
-                deepgram_client,
-                emit  # Pass emit for streaming
+                get_cerebras_handler(),
+                get_deepgram_client(),
+                lambda event, payload: send(session, event, payload),
+                turn
             )
             
+            if turn.cancelled:
+                send(session, 'turn_interrupted', {
+                    'turn_id': turn.turn_id,
+                    'spoken_agents': turn.spoken_agents,
+                    'interrupted_agent': turn.interrupted_agent
+                })
+                return
+            
             # All done
-            emit('status', {
+            send(session, 'status', {
                 'message': 'Ready for next question',
                 'type': 'complete'
             })
             
-            emit('processing_complete', {
+            send(session, 'processing_complete', {
                 'total_agents': len(agent_responses),
                 'remaining_time': session.remaining_time()
             })
             
+        except ServerBusyError as e:
+            send(session, 'server_busy', {
+                'message': str(e),
+                'retry_after': SERVER_BUSY_RETRY_AFTER
+            })
+        
         except Exception as e:
             print(f"❌ Error processing audio: {e}")
             import traceback
             traceback.print_exc()
-            emit('error', {
+            send(session, 'error', {
                 'message': f'Error: {str(e)}',
                 'recoverable': True
             })
         
         finally:
+            if profile:
+                profile.stop()
+            if admitted:
+                admission.release()
+            session.finish_turn(turn)
             if temp_dir:
                 shutil.rmtree(temp_dir, ignore_errors=True)
     
     
+    @socketio.on('interrupt')
+    def handle_interrupt():
+        """Stop the agents mid-turn without starting a new one"""
+        session = session_for_sid(request.sid)
+        if session and session.interrupt():
+            print(f"🛑 Interrupt requested: {request.sid}")
+    
+    
+    @socketio.on('ack')
+    def handle_ack(data=None):
+        """Client has everything up to event_seq; stop buffering it"""
+        session = session_for_sid(request.sid)
+        if not session or not isinstance(data, dict) or data.get('event_seq') is None:
+            return
+        try:
+            event_seq = int(data['event_seq'])
+        except (ValueError, TypeError):
+            return  # Malformed ack; the next one covers it
+        session.events.ack(event_seq)
+    
+    
+    @socketio.on('resume_session')
+    def handle_resume_session(data=None):
+        """Reattach a session after a reconnect and replay what was missed"""
+        data = data if isinstance(data, dict) else {}
+        token = data.get('resume_token')
+        try:
+            last_seq = int(data.get('last_event_seq') or 0)
+        except (ValueError, TypeError):
+            token = None
+        if not isinstance(token, str):
+            return emit('resume_failed', {
+                'message': 'Invalid resume request. Please start a new session.',
+                'recoverable': False
+            })
+        
+        with sessions_lock:
+            session = active_sessions.get(token)
+            if session is not None:
+                if session.sid is not None:
+                    sid_sessions.pop(session.sid, None)
+                sid_sessions[request.sid] = token
+        
+        if session is None:
+            return emit('resume_failed', {
+                'message': 'Session expired. Please start a new one.',
+                'recoverable': False
+            })
+        
+        # Hold the buffer while replaying so live events queue up behind it
+        with session.events.lock:
+            session.sid = request.sid
+            session.disconnected_at = None
+            missed = session.events.since(last_seq)
+            for event, payload in missed:
+                emit(event, payload)
+            emit('session_resumed', {
+                'replayed': len(missed),
+                # False when the buffer overflowed while away (e.g. audio
+                # chunks); the client should treat that turn's audio as lost
+                'complete': session.events.complete_since(last_seq),
+                'remaining_time': session.remaining_time()
+            })
+        print(f"🔁 Session resumed on {request.sid} ({len(missed)} events replayed)")
+    
+    
     @socketio.on('end_session')
     def handle_end_session():
         """End session and save logs"""
-        session = active_sessions.get(request.sid)
+        session = session_for_sid(request.sid)
         
-        if session:
-            session.save_log()
-            del active_sessions[request.sid]
+        if session and finalize_session(session):
             print(f"✅ Session ended: {request.sid}")
         
         emit('session_ended', {'message': 'Session saved'})
@@ -180,8 +365,21 @@ def register_socket_events(socketio):
     
     @socketio.on('disconnect')
     def handle_disconnect():
-        """Handle client disconnection"""
-        if request.sid in active_sessions:
-            active_sessions[request.sid].save_log()
-            del active_sessions[request.sid]
-            print(f"🔌 Disconnected: {request.sid}")
\ No newline at end of file
+        """Keep the session (and any running turn) alive for a resume"""
+        connected_users.pop(request.sid, None)
+        with sessions_lock:
+            token = sid_sessions.pop(request.sid, None)
+            session = active_sessions.get(token)
+        if session is None:
+            return
+        
+        with session.events.lock:
+            if session.sid != request.sid:
+                return  # Already resumed on another socket
+            session.sid = None
+            session.disconnected_at = disconnected_at = time.monotonic()
+        
+        timer = threading.Timer(RESUME_GRACE_PERIOD, expire_if_abandoned, (session, disconnected_at))
+        timer.daemon = True
+        timer.start()
+        print(f"🔌 Disconnected: {request.sid} (resumable for {RESUME_GRACE_PERIOD}s)")
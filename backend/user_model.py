@@ -1,28 +1,97 @@
-from flask_bcrypt import Bcrypt
-from database import db
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-bcrypt = Bcrypt()
+import bcrypt
+from pymongo.errors import DuplicateKeyError
+
+from repositories import users
+from config import BCRYPT_LOG_ROUNDS, BCRYPT_POOL_SIZE, BCRYPT_MAX_PENDING, BCRYPT_TIMEOUT
+
+
+class HashingBusyError(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+# ============================================================================
+# HASHING POOL
+# ============================================================================
+
+# bcrypt is CPU-bound and holds the GIL long enough to stall Socket.IO turns,
+# so it runs in separate processes. Spawned (not forked) because the server
+# is multi-threaded by the time the first login arrives.
+_hash_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+
+
+def _get_pool():
+    global _hash_pool
+    with _pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=BCRYPT_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _hash_pool
+
+
+def _password_bytes(password):
+    # bcrypt only looks at the first 72 bytes
+    return password.encode('utf-8')[:72]
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(hashed_password, password):
+    return bcrypt.checkpw(_password_bytes(password), hashed_password.encode('utf-8'))
+
+
+def _run_in_pool(fn, *args):
+    if not _pending.acquire(blocking=False):
+        raise HashingBusyError("Too many authentication requests, try again shortly")
+    try:
+        return _get_pool().submit(fn, *args).result(timeout=BCRYPT_TIMEOUT)
+    finally:
+        _pending.release()
+
+
+def hash_password(password):
+    """Hashes a password off the request thread."""
+    return _run_in_pool(_hash, password, BCRYPT_LOG_ROUNDS)
+
+
+def check_password(hashed_password, password):
+    """Checks if a plain-text password matches a hashed password."""
+    return _run_in_pool(_check, hashed_password, password)
+
+
+# ============================================================================
+# USERS
+# ============================================================================
+
+def find_user_by_email(email):
+    return users.find_by_email(email)
+
 
 def create_user(email, password):
     """Hashes a password and creates a new user in the database."""
-    if db is None:
-        raise Exception("Database not connected")
-    
-    # Check if user already exists
-    if db.users.find_one({"email": email}):
+    # Cheap indexed check first so taken emails don't cost a hash
+    if users.email_taken(email):
         raise ValueError("User with this email already exists")
 
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-    
+    hashed_password = hash_password(password)
+
     user_doc = {
         "email": email,
         "password": hashed_password,
         "created_at": datetime.utcnow()
     }
-    result = db.users.insert_one(user_doc)
-    return result.inserted_id
-
-def check_password(hashed_password, password):
-    """Checks if a plain-text password matches a hashed password."""
-    return bcrypt.check_password_hash(hashed_password, password)
\ No newline at end of file
+    try:
+        return users.insert(user_doc)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration
+        raise ValueError("User with this email already exists")
@@ -6,6 +6,27 @@ import { Sparkles, Mic, MicOff, ArrowLeft, Clock, Volume2 } from "lucide-react";
 import { toast } from "sonner";
 import { socketService } from "@/services/socketService";
 import { Socket } from "socket.io-client";
+import { AgentAudioPlayer, canStreamMimeType } from "@/services/audioPlayer";
+import { API_URL } from "@/services/api";
+
+const AUDIO_MIME_TYPES: Record<string, string> = {
+  opus: 'audio/ogg',
+  mp3: 'audio/mpeg',
+  wav: 'audio/wav',
+};
+
+// TTS formats this browser can play, most compact first. Formats that can
+// start playing mid-stream win, since agent audio arrives in chunks.
+const getPlayableAudioFormats = (): string[] => {
+  const probe = document.createElement('audio');
+  const formats: string[] = [];
+  if (probe.canPlayType('audio/ogg; codecs="opus"')) formats.push('opus');
+  if (probe.canPlayType('audio/mpeg')) formats.push('mp3');
+  formats.push('wav');
+
+  const streamable = formats.filter(f => canStreamMimeType(AUDIO_MIME_TYPES[f]));
+  return streamable.length > 0 ? [...streamable, 'wav'] : formats;
+};
 
 interface Message {
   role: "user" | "assistant";
@@ -15,8 +36,14 @@ interface Message {
 }
 
 const Chat = () => {
-  const audioQueueRef = useRef<string[]>([]);
-  const isPlayingRef = useRef(false);
+  const audioPlayerRef = useRef(new AgentAudioPlayer());
+  // Events from turns older than minTurnId were barged over and are dropped
+  const lastTurnIdRef = useRef(0);
+  const minTurnIdRef = useRef(0);
+  // Resumable session: reconnects replay every event after lastEventSeq
+  const resumeTokenRef = useRef<string | null>(null);
+  const lastEventSeqRef = useRef(0);
+  const unackedRef = useRef(0);
 
   const location = useLocation();
   const navigate = useNavigate();
@@ -48,6 +75,7 @@ const Chat = () => {
     initializeSession(socket);
 
     return () => {
+      audioPlayerRef.current.stop();
       socket.emit('end_session');
       socketService.disconnect();
     };
@@ -58,46 +86,46 @@ const Chat = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
-  // ==================================================================
-  // MODIFICATION 1: The new queue processing function replaces the old `playAudioFromBase64`.
-  // ==================================================================
-  const processAudioQueue = () => {
-    if (isPlayingRef.current || audioQueueRef.current.length === 0) {
-      return;
-    }
-
-    isPlayingRef.current = true;
-    const base64Audio = audioQueueRef.current.shift();
-
-    if (!base64Audio) {
-      isPlayingRef.current = false;
-      return;
-    }
+  const initializeSession = (socket: Socket) => {
+    const ack = () => {
+      unackedRef.current = 0;
+      socket.emit('ack', { event_seq: lastEventSeqRef.current });
+    };
 
-    try {
-      const audio = new Audio(`data:audio/wav;base64,${base64Audio}`);
-      
-      audio.onended = () => {
-        isPlayingRef.current = false;
-        processAudioQueue(); // Play the next item in the queue
-      };
+    // Track numbered session events so a reconnect can pick up from here
+    socket.onAny((_event, data) => {
+      if (typeof data?.event_seq !== 'number') return;
+      lastEventSeqRef.current = Math.max(lastEventSeqRef.current, data.event_seq);
+      if (++unackedRef.current >= 50) ack();
+    });
 
-      audio.play().catch(err => {
-        console.error('Audio play error:', err);
-        isPlayingRef.current = false;
-        processAudioQueue(); // Try the next item even if this one fails
+    socket.on('connect', () => {
+      if (!resumeTokenRef.current) return;
+      socket.emit('resume_session', {
+        resume_token: resumeTokenRef.current,
+        last_event_seq: lastEventSeqRef.current
       });
+    });
 
-    } catch (error) {
-      console.error('Error processing audio queue:', error);
-      isPlayingRef.current = false;
-    }
-  };
+    socket.on('session_resumed', (data) => {
+      console.log(`🔁 Session resumed (${data.replayed} missed events)`);
+      if (data.complete === false) {
+        toast.success('Reconnected (some audio was skipped)');
+      } else {
+        toast.success('Reconnected');
+      }
+    });
+
+    socket.on('resume_failed', (data) => {
+      toast.error(data.message);
+      resumeTokenRef.current = null;
+      endSession();
+    });
 
-  const initializeSession = (socket: Socket) => {
     // Setup socket listeners
     socket.on('session_started', (data) => {
       console.log('✅ Session started:', data);
+      resumeTokenRef.current = data.resume_token;
       setSessionActive(true);
       setTimeRemaining(data.duration * 60);
       
@@ -110,8 +138,14 @@ const Chat = () => {
       toast.success(`Session started: ${data.room}`);
     });
 
+    const isStale = (data: { turn_id?: number }) =>
+      data.turn_id !== undefined && data.turn_id < minTurnIdRef.current;
+
     socket.on('transcription', (data) => {
       console.log('📝 Transcription:', data.text);
+      if (data.turn_id !== undefined) {
+        lastTurnIdRef.current = Math.max(lastTurnIdRef.current, data.turn_id);
+      }
       setMessages(prev => [...prev, {
         role: "user",
         content: data.text,
@@ -123,10 +157,9 @@ const Chat = () => {
       console.log(`🤖 ${data.agent}: ${data.status}`);
     });
 
-    // ==================================================================
-    // MODIFICATION 2: The 'agent_response' handler now uses the queue.
-    // ==================================================================
+    // Agent audio is queued so agents speak one after another
     socket.on('agent_response', (data) => {
+      if (isStale(data)) return;
       console.log(`💬 Agent response from ${data.agent}`);
       
       setMessages(prev => [...prev, {
@@ -136,17 +169,41 @@ const Chat = () => {
         timestamp: new Date().toISOString()
       }]);
 
-      // Add the incoming audio to our queue and start processing it
-      if (data.audio) {
-        audioQueueRef.current.push(data.audio);
-        processAudioQueue();
+      const mimeType = data.mime_type || 'audio/wav';
+      if (data.streamed) {
+        audioPlayerRef.current.startStream(data.agent_index, mimeType);
+      } else if (data.audio_url) {
+        audioPlayerRef.current.enqueueUrl(`${API_URL}${data.audio_url}`, mimeType);
+      } else if (data.audio) {
+        audioPlayerRef.current.enqueueClip(data.audio, mimeType);
       }
 
       setTimeRemaining(data.remaining_time);
     });
 
+    socket.on('agent_audio_chunk', (data) => {
+      if (isStale(data)) return;
+      audioPlayerRef.current.appendChunk(data.agent_index, data.audio, data.final);
+    });
+
+    socket.on('queued', (data) => {
+      if (isStale(data)) return;
+      toast.info(`High demand - you're #${data.position} in line`, { id: 'queued' });
+    });
+
+    socket.on('server_busy', (data) => {
+      console.warn('🚦 Server busy:', data);
+      toast.error(`${data.message} (retry in ${data.retry_after}s)`);
+      setIsProcessing(false);
+    });
+
+    socket.on('turn_interrupted', (data) => {
+      console.log(`🛑 Turn ${data.turn_id} interrupted after:`, data.spoken_agents);
+    });
+
     socket.on('processing_complete', () => {
       console.log('✅ All agents finished');
+      ack();
       setIsProcessing(false);
     });
 
@@ -164,7 +221,16 @@ const Chat = () => {
     });
 
     // Start session
-    socket.emit('start_session', { room });
+    // Stream chunks only when playback can start mid-clip; otherwise let
+    // the browser fetch (and cache) each clip by URL
+    const audioFormats = getPlayableAudioFormats();
+    socket.emit('start_session', {
+      // Registered rooms are started by id; the server has the definition
+      ...(room.room_id ? { room_id: room.room_id } : { room }),
+      audio_formats: audioFormats,
+      stream_audio: audioFormats.some(f => canStreamMimeType(AUDIO_MIME_TYPES[f])),
+      audio_delivery: 'url'
+    });
 
     // Start countdown
     const interval = setInterval(() => {
@@ -181,8 +247,6 @@ const Chat = () => {
     return () => clearInterval(interval);
   };
 
-  // The old `playAudioFromBase64` function is no longer needed.
-
   const checkMicrophonePermission = async () => {
     try {
       const permissions = await navigator.permissions.query({ name: 'microphone' as PermissionName });
@@ -197,8 +261,16 @@ const Chat = () => {
     }
   };
 
+  // Speaking over the agents silences them and cancels the rest of the turn
+  const bargeIn = () => {
+    minTurnIdRef.current = lastTurnIdRef.current + 1;
+    audioPlayerRef.current.stop();
+    socketRef.current?.emit('interrupt');
+    setIsProcessing(false);
+  };
+
   const startRecording = async () => {
-    // This function remains unchanged
+    bargeIn();
     try {
       console.log('Starting recording...');
       const stream = await navigator.mediaDevices.getUserMedia({ 
@@ -390,7 +462,7 @@ const Chat = () => {
               onMouseUp={stopRecording}
               onTouchStart={startRecording}
               onTouchEnd={stopRecording}
-              disabled={!sessionActive || isProcessing}
+              disabled={!sessionActive}
               className={`w-20 h-20 rounded-full flex items-center justify-center transition-all disabled:opacity-50 disabled:cursor-not-allowed ${
                 isRecording
                   ? "bg-destructive animate-pulse shadow-glow"
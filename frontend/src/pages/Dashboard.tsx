@@ -7,6 +7,7 @@ import { toast } from "sonner";
 import { roomsApi } from "@/services/api"; // --- MODIFIED: Import the API service ---
 
 interface Room {
+  room_id: string;
   name: string;
   description: string;
   session_duration_minutes: number;
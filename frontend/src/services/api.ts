@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_URL = 'http://localhost:5000';
+export const API_URL = 'http://localhost:5000';
 
 export const api = axios.create({
   baseURL: API_URL,
@@ -0,0 +1,144 @@
+// Sequential player for agent audio. Clips either arrive whole (base64 in
+// agent_response), by URL (audio_url, fetched and cached by the browser) or
+// as agent_audio_chunk events; streamed clips start playing through
+// MediaSource as soon as the first chunk lands when the browser supports
+// the format, otherwise they play once complete.
+
+interface Clip {
+  mimeType: string;
+  chunks: ArrayBuffer[];
+  done: boolean;
+  url?: string;
+  onChunk?: () => void;
+}
+
+const base64ToBytes = (base64: string): ArrayBuffer => {
+  const binary = atob(base64);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  return bytes.buffer as ArrayBuffer;
+};
+
+export const canStreamMimeType = (mimeType: string): boolean =>
+  typeof window !== 'undefined' &&
+  'MediaSource' in window &&
+  MediaSource.isTypeSupported(mimeType);
+
+export class AgentAudioPlayer {
+  private queue: Clip[] = [];
+  private streams = new Map<number, Clip>();
+  private playing = false;
+  private current: HTMLAudioElement | null = null;
+
+  // Whole clip from agent_response
+  enqueueClip(base64Audio: string, mimeType: string) {
+    this.queue.push({ mimeType, chunks: [base64ToBytes(base64Audio)], done: true });
+    this.playNext();
+  }
+
+  // Clip served by the backend's audio store
+  enqueueUrl(url: string, mimeType: string) {
+    this.queue.push({ mimeType, chunks: [], done: true, url });
+    this.playNext();
+  }
+
+  // Announced by agent_response with streamed=true; chunks follow
+  startStream(agentIndex: number, mimeType: string) {
+    const clip: Clip = { mimeType, chunks: [], done: false };
+    this.streams.set(agentIndex, clip);
+    this.queue.push(clip);
+    this.playNext();
+  }
+
+  appendChunk(agentIndex: number, base64Audio: string, final: boolean) {
+    const clip = this.streams.get(agentIndex);
+    if (!clip) return;
+
+    if (base64Audio) clip.chunks.push(base64ToBytes(base64Audio));
+    if (final) {
+      clip.done = true;
+      this.streams.delete(agentIndex);
+    }
+    clip.onChunk?.();
+  }
+
+  stop() {
+    this.queue = [];
+    this.streams.clear();
+    this.current?.pause();
+    this.current = null;
+    this.playing = false;
+  }
+
+  private playNext() {
+    if (this.playing || this.queue.length === 0) return;
+
+    const clip = this.queue.shift()!;
+    this.playing = true;
+
+    if (clip.url) {
+      this.start(clip.url, false);
+    } else if (!clip.done && canStreamMimeType(clip.mimeType)) {
+      this.playStreaming(clip);
+    } else if (clip.done) {
+      this.playBuffered(clip);
+    } else {
+      // Wait for the rest of the clip, then play it whole
+      clip.onChunk = () => {
+        if (clip.done) {
+          clip.onChunk = undefined;
+          this.playBuffered(clip);
+        }
+      };
+    }
+  }
+
+  private finish(url: string, revoke = true) {
+    if (revoke) URL.revokeObjectURL(url);
+    this.current = null;
+    this.playing = false;
+    this.playNext();
+  }
+
+  private playBuffered(clip: Clip) {
+    const url = URL.createObjectURL(new Blob(clip.chunks, { type: clip.mimeType }));
+    this.start(url);
+  }
+
+  private playStreaming(clip: Clip) {
+    const mediaSource = new MediaSource();
+    const url = URL.createObjectURL(mediaSource);
+
+    mediaSource.addEventListener('sourceopen', () => {
+      const buffer = mediaSource.addSourceBuffer(clip.mimeType);
+      let appended = 0;
+
+      const pump = () => {
+        if (buffer.updating || mediaSource.readyState !== 'open') return;
+        if (appended < clip.chunks.length) {
+          buffer.appendBuffer(clip.chunks[appended++]);
+        } else if (clip.done) {
+          mediaSource.endOfStream();
+        }
+      };
+
+      buffer.addEventListener('updateend', pump);
+      clip.onChunk = pump;
+      pump();
+    });
+
+    this.start(url);
+  }
+
+  private start(url: string, revoke = true) {
+    const audio = new Audio(url);
+    this.current = audio;
+    audio.onended = () => this.finish(url, revoke);
+    audio.play().catch(err => {
+      console.error('Audio play error:', err);
+      this.finish(url, revoke);
+    });
+  }
+}